@@ -1,15 +1,21 @@
+import pandas as pd
 import streamlit as st
 from modules.authentication import require_role
 from modules.user_utils import (
     spreadsheet,
     approve_user,
     ensure_users_sheet,
+    delete_record,
+    get_password_hasher,
     delete_registration_request,
+    get_table_records,
     log_registration_event,
     ensure_reg_requests_sheet
 )
-from modules.email_utils import send_email
-from constants import REG_REQUESTS_SHEET
+from modules.email_utils import get_outbox, send_email
+from modules.sheets_client import get_tracer, get_worksheet
+from constants import MERGED_SHEET, REG_REQUESTS_SHEET
+from resource import compact_tombstones, sheet as main_sheet
 
 def admin_panel():
     require_role(["admin"])
@@ -20,7 +26,7 @@ def admin_panel():
     # -- Section 1: Pending Requests --
     st.subheader("📥 Pending Registration Requests")
     sheet = ensure_reg_requests_sheet(spreadsheet)
-    requests = sheet.get_all_records()
+    requests = get_table_records(sheet)
 
     if not requests:
         st.info("No pending registration requests.")
@@ -74,7 +80,7 @@ def admin_panel():
     # -- Section 2: Delete Approved Users --
     st.subheader("🗑 Manage Existing Users")
     users_sheet = ensure_users_sheet(spreadsheet)
-    approved_users = users_sheet.get_all_records()
+    approved_users = get_table_records(users_sheet)
     usernames = [user["Username"] for user in approved_users]
 
     if usernames:
@@ -105,16 +111,72 @@ def admin_panel():
     else:
         st.info("No approved users to manage.")
 
+    # -- Section 3: Compact Soft-Deleted Records --
+    st.subheader("🧹 Compact Deleted Records")
+    st.caption("Deleted records stay in place (and can be undone) until they are compacted into 'Deleted Records'.")
+    if st.button("🧹 Compact deleted records"):
+        try:
+            removed = compact_tombstones(main_sheet)
+            removed += compact_tombstones(get_worksheet(spreadsheet, MERGED_SHEET), "Merged Sheet")
+            st.success(f"✅ Moved {removed} deleted rows to 'Deleted Records'.")
+        except Exception as e:
+            st.error(f"Compaction failed: {e}")
+
+    # -- Section 4: Sheets API Usage --
+    show_sheets_usage()
+
+    # -- Section 5: Password Hashing --
+    show_password_hasher_stats()
+
+    # -- Section 6: Email Outbox --
+    show_email_outbox_stats()
+
+
+def show_sheets_usage():
+    st.subheader("📈 Sheets API Usage")
+    st.caption("Calls recorded by this server process, grouped by the page that made them.")
+    tracer = get_tracer()
+
+    pages = pd.DataFrame(tracer.page_summary())
+    if pages.empty:
+        st.info("No Sheets calls recorded yet.")
+        return
+
+    st.markdown("**Top pages by p95 Sheets time per rerun**")
+    st.dataframe(pages, use_container_width=True, hide_index=True)
+
+    with st.expander("🔎 Calls by page, method and sheet"):
+        methods = pd.DataFrame(tracer.method_summary())
+        page_filter = st.selectbox("Page", ["All"] + sorted(methods["Page"].unique()), key="usage_page")
+        if page_filter != "All":
+            methods = methods[methods["Page"] == page_filter]
+        st.dataframe(methods, use_container_width=True, hide_index=True)
+
+    if st.button("♻️ Reset usage statistics"):
+        tracer.reset()
+        st.rerun()
+
+def show_password_hasher_stats():
+    st.subheader("🔐 Password Hashing")
+    stats = get_password_hasher().stats()
+    st.caption(f"{stats['workers']} workers, bcrypt cost {stats['rounds']}.")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Queued", stats["queued"], help=f"Peak: {stats['peak_pending']}")
+    col2.metric("Completed", stats["completed"], help=f"Failed: {stats['failed']}, rejected: {stats['rejected']}")
+    col3.metric("Avg wait (s)", stats["avg_wait_seconds"])
+    col4.metric("Avg hash (s)", stats["avg_work_seconds"])
+
+def show_email_outbox_stats():
+    st.subheader("📧 Email Outbox")
+    outbox = get_outbox()
+    stats = outbox.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Pending", stats["pending"])
+    col2.metric("Sent", stats["sent"], help=f"In {stats['batches']} batches over {stats['connections']} connections")
+    col3.metric("Failed", stats["failed"])
+    col4.metric("Retries", stats["retries"])
+    if outbox.last_error is not None and stats["pending"]:
+        st.warning(f"Last send error (will retry): {outbox.last_error}")
+
 def delete_user_from_users_sheet(username, users_sheet):
-    data = users_sheet.get_all_values()
-    header = data[0]
-    try:
-        username_col_index = header.index("Username")
-    except ValueError:
-        return False
-
-    for i, row in enumerate(data[1:], start=2):  # Skip header
-        if row[username_col_index].strip().lower() == username.strip().lower():
-            users_sheet.delete_rows(i)
-            return True
-    return False
+    return delete_record(spreadsheet, users_sheet, "Username", username)
@@ -1,31 +1,50 @@
+import time
+_app_started = time.perf_counter()
+
 import sys
 sys.path.append("modules")
 
 import streamlit as st
-import json
-import gspread
 import os
 
-from oauth2client.service_account import ServiceAccountCredentials
 from streamlit_option_menu import option_menu
 
 # === Internal Module Imports ===
-from admin.show import show
-from admin.user_management import admin_panel
-from components import (
-    data_entry_form,
-    edit_data_entry_form,
-    pm25_calculation,
-    supervisor_review_section,
-    apartment
-)
+# Page modules are imported only when their page is opened (see PAGES).
 from modules.authentication import login, logout_button
-from modules.user_utils import get_user_role, spreadsheet,ensure_users_sheet
-from resource import load_data_from_sheet, sheet, spreadsheet
+from modules.user_utils import ensure_users_sheet
+from modules.sheets_client import get_spreadsheet, get_tracer
+from modules.startup_profile import StartupProfile, log_once
 from constants import MERGED_SHEET, CALC_SHEET, USERS_SHEET
 
+_app_imported = time.perf_counter()
+
 st.set_page_config(layout="wide")
 
+# Attribute every Sheets call in this rerun to the page it renders.
+rerun_trace = get_tracer().begin()
+profile = StartupProfile(rerun_trace, started=_app_started)
+profile.record_import("app.py imports", _app_imported - _app_started)
+
+# page: (module, function that renders it)
+PAGES = {
+    "Home": ("components.apartment", "show"),
+    "Data Entry Form": ("components.data_entry_form", "show"),
+    "Edit Data Entry Form": ("components.edit_data_entry_form", "show"),
+    "PM25 Calculation": ("components.pm25_calculation", "show"),
+    "Supervisor Review Section": ("components.supervisor_review_section", "show"),
+    "Admin Panel": ("admin.user_management", "admin_panel"),
+}
+
+
+def report_startup():
+    # Logged for the first rerun of each process; shown in the sidebar with
+    # the PROFILE_STARTUP secret.
+    log_once(profile)
+    if st.secrets.get("PROFILE_STARTUP", False):
+        with st.sidebar.expander("⏱ Startup timing"):
+            st.json(profile.report())
+
 st.markdown("""
 <style>
 /* GLOBAL */
@@ -192,26 +211,17 @@ section[data-testid="stSidebar"] {
 
 
 # === Google Sheets Auth ===
-creds_dict = json.loads(st.secrets["GOOGLE_CREDENTIALS"])
-scope = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive"
-]
-creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-client = gspread.authorize(creds)
-
-SPREADSHEET_ID = st.secrets["SPREADSHEET_ID"]
-spreadsheet = client.open_by_key(SPREADSHEET_ID)
+spreadsheet = get_spreadsheet()
 users_sheet = ensure_users_sheet(spreadsheet)
 
 
 # === LOGIN GATE ===
-logged_in, authenticator = login(users_sheet)
-if not logged_in:
-    st.stop()
-    st.markdown('</div>', unsafe_allow_html=True)
+# st.stop() and st.rerun() end the rerun here; the trace is finished first.
+with get_tracer().finishing(rerun_trace):
+    logged_in, authenticator = login(users_sheet)
+    if not logged_in:
+        report_startup()
+        st.stop()
 
 
 
@@ -250,16 +260,6 @@ st.info(f"👤 Logged in as: **{username}** (Role: {role})")
 
 
 
-# === Load Data Once ===
-if "df" not in st.session_state:
-    with st.spinner("🔄 Loading data..."):
-        st.session_state.df = load_data_from_sheet(sheet)
-        st.session_state.sheet = sheet
-        st.session_state.spreadsheet = spreadsheet
-
-
-
-
 role_pages = {
     "admin": [
         ("🏠 Home", "Home"),
@@ -345,21 +345,19 @@ with st.sidebar:
 # 7. Page Routing
 # ------------------------
 choice = st.session_state.get("selected_page")
+rerun_trace.page = choice or rerun_trace.page
 
 
 # === Page Routing ===
-if choice == "Home":
-    apartment.show()
-elif choice == "Data Entry Form":
-    data_entry_form.show()
-elif choice == "📊 PM25 Calculation":
-    pm25_calculation.show()
-elif choice == "Edit Data Entry Form":
-    edit_data_entry_form.show()
-elif choice == "Supervisor Review Section":
-    supervisor_review_section.show()
-elif choice == "Admin Panel":
-    admin_panel()
+if choice in PAGES:
+    module_name, render = PAGES[choice]
+    page = profile.import_module(module_name)
+    # Pages end early with require_role's st.stop() and with st.rerun().
+    with get_tracer().finishing(rerun_trace):
+        getattr(page, render)()
+
+report_startup()
+get_tracer().finish(rerun_trace)
     
 st.markdown("""
 <hr>
@@ -0,0 +1,197 @@
+"""Benchmark the data pipeline on synthetic Observations data.
+
+Runs without Streamlit or Sheets and prints a table of timings. With
+``--output`` the run is also saved as JSON, so two runs can be compared
+before and after a change.
+
+Run from the app directory:
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 100000 1000000 --output before.json
+    python benchmarks/bench_pipeline.py --output after.json --compare before.json
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.pipeline import (
+    OBSERVATION_COLUMNS,
+    SiteDayIndex,
+    apply_schema,
+    filter_records,
+    filter_site_day,
+    make_unique_headers,
+    merge_start_stop,
+    sanitize_for_google_sheets,
+)
+from modules.pm25_engine import POST_WEIGHT_COL, PRE_WEIGHT_COL, calculate_pm25
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+N_SITES = 10
+
+
+def make_observations(n, sites=N_SITES, seed=0):
+    """``n`` Observations rows as strings, in START/STOP pairs spread over ``sites``."""
+    rng = np.random.default_rng(seed)
+    pairs = max(1, n // 2)
+    site = rng.integers(0, sites, pairs)
+    day = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, pairs), unit="D")
+    start_at = day + pd.to_timedelta(rng.integers(6 * 60, 10 * 60, pairs), unit="min")
+    stop_at = start_at + pd.to_timedelta(rng.integers(1380, 1500, pairs), unit="min")
+    elapsed_start = rng.integers(0, 100_000, pairs)
+    elapsed_stop = elapsed_start + (stop_at - start_at).total_seconds().astype(int) // 60
+
+    def rows(entry_type, when, elapsed):
+        return pd.DataFrame({
+            "Entry Type": entry_type,
+            "ID": [f"S{s:02d}-{i}" for i, s in enumerate(site)],
+            "Site": [f"Site {s + 1}" for s in site],
+            "Latitude": (5.5 + site * 0.01).round(4).astype(str),
+            "Longitude": (-0.2 - site * 0.01).round(4).astype(str),
+            "Monitoring Officer": "Officer",
+            "Driver": "Driver",
+            "Date": when.strftime("%Y-%m-%d"),
+            "Time": when.strftime("%H:%M"),
+            "Temperature (°C)": rng.uniform(22, 35, pairs).round(1).astype(str),
+            "RH (%)": rng.uniform(40, 95, pairs).round(1).astype(str),
+            "Pressure (mbar)": rng.uniform(995, 1015, pairs).round(1).astype(str),
+            "Weather": rng.choice(["Sunny", "Cloudy", "Rainy"], pairs),
+            "Wind Speed": rng.uniform(0, 8, pairs).round(1).astype(str),
+            "Wind Direction": rng.choice(["N", "E", "S", "W"], pairs),
+            "Elapsed Time (min)": elapsed.astype(str),
+            "Flow Rate (L/min)": rng.uniform(4.8, 5.2, pairs).round(2).astype(str),
+            "Observation": "",
+            "Submitted By": "bench",
+            "Submitted At": when.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+
+    df = pd.concat([rows("START", start_at, elapsed_start), rows("STOP", stop_at, elapsed_stop)])
+    df = df.sort_values("Submitted At", kind="stable").head(n).reset_index(drop=True)
+    return df[OBSERVATION_COLUMNS]
+
+
+def add_weights(merged, seed=0):
+    rng = np.random.default_rng(seed)
+    pre = rng.uniform(0.1, 0.2, len(merged)).round(6)
+    merged = merged.copy()
+    merged[PRE_WEIGHT_COL] = pre
+    merged[POST_WEIGHT_COL] = (pre + rng.uniform(0, 0.001, len(merged))).round(6)
+    return merged
+
+
+def cases(df):
+    """(name, rows processed, zero-argument call) for every benchmarked function."""
+    typed = apply_schema(df)
+    merged = merge_start_stop(df)
+    weighed = add_weights(merged)
+    index = SiteDayIndex(typed)
+    day = pd.to_datetime(df["Submitted At"]).dt.date.iloc[len(df) // 2]
+    headers = [col for _ in range(max(1, len(df) // len(OBSERVATION_COLUMNS))) for col in OBSERVATION_COLUMNS]
+    return [
+        ("apply_schema", len(df), lambda: apply_schema(df)),
+        ("merge_start_stop", len(df), lambda: merge_start_stop(df)),
+        ("merge_start_stop (typed)", len(df), lambda: merge_start_stop(typed)),
+        ("sanitize_for_google_sheets", len(merged), lambda: sanitize_for_google_sheets(merged)),
+        ("filter_dataframe", len(df), lambda: filter_records(df, "Site 3", (day, day + datetime.timedelta(days=30)))),
+        ("filter_dataframe (typed)", len(df), lambda: filter_records(typed, "Site 3", (day, day + datetime.timedelta(days=30)))),
+        ("filter_by_site_and_date", len(df), lambda: filter_site_day(df, "Site 3", day)),
+        ("SiteDayIndex build", len(df), lambda: SiteDayIndex(typed)),
+        ("SiteDayIndex site/day", len(df), lambda: typed.iloc[index.positions("Site 3", day, day)]),
+        ("SiteDayIndex site/range", len(df), lambda: typed.iloc[index.positions("Site 3", day, day + datetime.timedelta(days=30))]),
+        ("make_unique_headers", len(headers), lambda: make_unique_headers(headers)),
+        ("calculate_pm25", len(weighed), lambda: calculate_pm25(weighed)),
+    ]
+
+
+def measure(call, repeat):
+    # Best-of wall time without tracing, then one traced run for peak memory.
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - t0)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run(sizes, repeat, only=None):
+    results = []
+    for n in sizes:
+        df = make_observations(n)
+        for name, rows, call in cases(df):
+            if only and name not in only:
+                continue
+            seconds, peak = measure(call, repeat)
+            result = {
+                "function": name,
+                "rows": rows,
+                "seconds": round(seconds, 6),
+                "peak_mb": round(peak / 2 ** 20, 3),
+                "rows_per_sec": round(rows / seconds) if seconds else None,
+            }
+            results.append(result)
+            print(f"{name:<28} rows={rows:>9}  {seconds:9.4f}s  "
+                  f"{result['peak_mb']:9.1f} MB  {result['rows_per_sec'] or 0:>12,} rows/s")
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["function"], r["rows"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}:")
+    for r in results:
+        old = baseline.get((r["function"], r["rows"]))
+        if old and r["seconds"]:
+            print(f"{r['function']:<28} rows={r['rows']:>9}  time x{old['seconds'] / r['seconds']:6.2f} faster  "
+                  f"memory {r['peak_mb'] - old['peak_mb']:+9.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case; the best is kept")
+    parser.add_argument("--only", nargs="+", help="benchmark only these functions")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="earlier JSON output to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.only)
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {len(results)} results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
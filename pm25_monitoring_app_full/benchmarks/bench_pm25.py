@@ -0,0 +1,65 @@
+"""Time the vectorized PM₂.₅ engine against the old row-wise apply.
+
+Run from the app directory: python benchmarks/bench_pm25.py [rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from modules.pm25_engine import PM25_COL, QA_OK, QA_STATUS_COL, calculate_pm25
+
+
+def make_merged_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    pre = rng.uniform(0.1, 0.2, n).round(6)
+    return pd.DataFrame({
+        "Elapsed Time Diff (min)": rng.choice([1440.0, 1439.0, 1000.0], n).astype(str),
+        "Average Flow Rate (L/min)": rng.choice([5.0, 16.7, 0.0], n).astype(str),
+        "Pre Weight (g)": pre,
+        "Post Weight (g)": (pre + rng.uniform(-0.0001, 0.001, n)).round(6),
+    })
+
+
+def rowwise_pm(row):
+    try:
+        elapsed = float(row["Elapsed Time Diff (min)"])
+        flow = float(row["Average Flow Rate (L/min)"])
+        pre = float(row["Pre Weight (g)"])
+        post = float(row["Post Weight (g)"])
+        mass_mg = (post - pre) * 1000
+        if elapsed < 1200: return "Elapsed < 1200"
+        if flow <= 0.05: return "Invalid Flow"
+        if post < pre: return "Post < Pre"
+        volume_m3 = (flow * elapsed) / 1000
+        if volume_m3 == 0: return "Zero Volume"
+        return (mass_mg * 1000) / volume_m3
+    except Exception:
+        return "Error"
+
+
+def main(n):
+    df = make_merged_rows(n)
+
+    t0 = time.perf_counter()
+    result = calculate_pm25(df)
+    vectorized = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    legacy = df.apply(rowwise_pm, axis=1)
+    rowwise = time.perf_counter() - t0
+
+    ok = result[QA_STATUS_COL] == QA_OK
+    assert np.allclose(result.loc[ok, PM25_COL], legacy[ok].astype(float))
+    assert (result.loc[~ok, QA_STATUS_COL].astype(str) == legacy[~ok]).all()
+
+    print(f"rows={n}  vectorized={vectorized:.3f}s  row-wise={rowwise:.3f}s  "
+          f"speed-up={rowwise / vectorized:.0f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
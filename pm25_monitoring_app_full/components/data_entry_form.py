@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 from resource import (
-    load_data_from_sheet,
+    load_data_incremental,
     add_data,
     merge_start_stop,
     save_merged_data_to_sheet,
@@ -26,6 +26,16 @@ def required_label(label):
     return f"<span style='color:red;'>*</span> <strong>{label}</strong>"
 
 
+def show_submit_status(ack, label, timeout=15):
+    with st.spinner("💾 Saving..."):
+        try:
+            ack.result(timeout=timeout)
+        except TimeoutError:
+            st.info(f"⏳ {label} data saved on the server; it will be written to the sheet shortly.")
+            return
+    st.success(f"✅ {label} data submitted successfully!")
+
+
 def show():
     require_role(["admin", "officer"])
 
@@ -163,8 +173,8 @@ def show():
                         start_wind_speed, start_wind_direction,
                         start_elapsed, start_flow, start_obs
                     ]
-                    add_data(start_row, st.session_state.username)
-                    st.success("✅ Start day data submitted successfully!")
+                    ack = add_data(start_row, st.session_state.username)
+                    show_submit_status(ack, "Start day")
 
         elif entry_type == "STOP":
             with st.expander("🔴 Stop Day Monitoring", expanded=True):
@@ -245,13 +255,13 @@ def show():
                         stop_wind_speed, stop_wind_direction,
                         stop_elapsed, stop_flow, stop_obs
                     ]
-                    add_data(stop_row, st.session_state.username)
-                    st.success("✅ Stop day data submitted successfully!")
+                    ack = add_data(stop_row, st.session_state.username)
+                    show_submit_status(ack, "Stop day")
 
     with tab2:
         st.subheader("🔄 Merge START and STOP Entries")
 
-        df = load_data_from_sheet(sheet)
+        df = load_data_incremental(sheet)
         if df.empty:
             st.info("ℹ️ No observation data found.")
         else:
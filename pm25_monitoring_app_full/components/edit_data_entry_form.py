@@ -4,20 +4,26 @@ from datetime import datetime
 from datetime import time as dtime
 
 from resource import (
-    load_data_from_sheet,
+    load_data_incremental,
     add_data,
     merge_start_stop,
-    save_merged_data_to_sheet,
     delete_row,
     delete_merged_record_by_index,
     filter_by_site_and_date,
+    site_day_index,
     backup_deleted_row,
     restore_specific_deleted_record,
+    restore_tombstoned_row,
+    tombstoned_rows,
+    sync_merged_records,
+    update_row_if_unchanged,
+    get_storage,
+    RECORD_IDENTITY_COLUMNS,
     sheet,
     spreadsheet,
     display_and_merge_data
 )
-from constants import MERGED_SHEET
+from constants import DELETED_SHEET, MERGED_SHEET
 from modules.authentication import require_role
 
 
@@ -72,9 +78,10 @@ def show():
 
         def get_float(key, default=0.0):
             try:
-                return float(record_data.get(key, default))
+                value = float(record_data.get(key, default))
             except (ValueError, TypeError):
                 return default
+            return default if pd.isna(value) else value
 
         def get_date(key):
             try:
@@ -122,18 +129,18 @@ def show():
         ]
 
     def handle_merge_logic():
-        df = load_data_from_sheet(sheet)
+        df = load_data_incremental(sheet)
         merged_df = merge_start_stop(df)
 
         if not merged_df.empty:
-            save_merged_data_to_sheet(merged_df, spreadsheet, sheet_name=MERGED_SHEET)
-            st.success("🩸 Merged records updated.")
+            if sync_merged_records(df, spreadsheet, MERGED_SHEET) is not None:
+                st.success("🩸 Merged records updated.")
             st.dataframe(merged_df, use_container_width=True)
         else:
             st.warning("⚠ No matching records to merge.")
 
     st.sidebar.header("🔍 Filter Records")
-    df_all = load_data_from_sheet(sheet)
+    df_all = load_data_incremental(sheet)
 
     date_column = None
     for col in df_all.columns:
@@ -145,16 +152,20 @@ def show():
         st.error("☠️ No 'Date' column found. Please check your Google Sheet headers.")
         st.stop()
 
+    index = site_day_index(df_all, date_col=date_column)
     df_all["Date"] = pd.to_datetime(df_all[date_column], errors='coerce').dt.date
-    unique_sites = sorted(df_all["Site"].dropna().unique())
+    unique_sites = index.sites if index is not None else sorted(df_all["Site"].dropna().unique())
     selected_site = st.sidebar.selectbox("Filter by Site", ["All"] + unique_sites)
     selected_date = st.sidebar.date_input("Filter by Date", value=None)
 
-    filtered_df = df_all.copy()
-    if selected_site != "All":
-        filtered_df = filtered_df[filtered_df["Site"] == selected_site]
-    if selected_date:
-        filtered_df = filtered_df[filtered_df["Date"] == selected_date]
+    if index is not None:
+        filtered_df = df_all.iloc[index.positions(selected_site, selected_date, selected_date)]
+    else:
+        filtered_df = df_all.copy()
+        if selected_site != "All":
+            filtered_df = filtered_df[filtered_df["Site"] == selected_site]
+        if selected_date:
+            filtered_df = filtered_df[filtered_df["Date"] == selected_date]
 
     def edit_submitted_record():
         df = filtered_df.copy()
@@ -192,14 +203,17 @@ def show():
                         submitted = st.form_submit_button("Update Record")
 
                         if submitted:
-                            for col_index, value in enumerate(updated_data, start=1):
-                                sheet.update_cell(row_number, col_index, value)
+                            opened = filtered_df.loc[selected_index]
+                            expected = {col: opened[col] for col in RECORD_IDENTITY_COLUMNS if col in opened.index}
 
-                            st.success("🧠 Record updated successfully!")
-                            st.session_state.selected_record = None
-                            st.session_state.edit_expanded = False
+                            if update_row_if_unchanged(sheet, int(row_number), expected, updated_data):
+                                st.success("🧠 Record updated successfully!")
+                                st.session_state.selected_record = None
+                                st.session_state.edit_expanded = False
 
-                            handle_merge_logic()
+                                handle_merge_logic()
+                            else:
+                                st.error("☠️ This record was changed or moved since you opened it. Please reselect it and try again.")
                 except Exception as e:
                     st.error(f"☠️ Error: {e}")
 
@@ -221,17 +235,35 @@ def show():
                 if st.button("🗑️ Delete Submitted Record"):
                     deleted_by = st.session_state.username
                     delete_row(sheet, row_to_delete, deleted_by)
-                    st.success(f"✅ Submitted record deleted by {deleted_by} and backed up successfully.")
+                    st.success(f"✅ Submitted record deleted by {deleted_by}. It can be undone until the next compaction.")
                     st.rerun()
 
+    # --- Undo recent deletions (tombstoned, not yet compacted) ---
+    df_tombstoned = tombstoned_rows(load_data_incremental(sheet, include_deleted=True))
+    if not df_tombstoned.empty:
+        st.subheader("↩️ Undo Recent Deletions")
+        df_tombstoned = df_tombstoned.copy()
+        df_tombstoned["Row Number"] = df_tombstoned.index + 2
+        df_tombstoned["Record ID"] = df_tombstoned.apply(
+            lambda x: f"{x['Entry Type']} | {x['ID']} | {x['Site']} | {x['Submitted At']} (Deleted by: {x['Deleted By']})", axis=1
+        )
+        selected_undo = st.selectbox("Select a deleted record to undo:", [""] + df_tombstoned["Record ID"].tolist())
+
+        if selected_undo and st.button("↩️ Undo Deletion"):
+            row_to_restore = int(df_tombstoned[df_tombstoned["Record ID"] == selected_undo]["Row Number"].values[0])
+            restore_tombstoned_row(sheet, row_to_restore)
+            handle_merge_logic()
+            st.success("🧠 Record restored.")
+            st.rerun()
+
     # --- Restore Deleted Records ---
     st.markdown("---")
     st.header("🗃️ Restore Deleted Record")
 
     # Assume required session state or external dependencies are available
     try:
-        backup_sheet = spreadsheet.worksheet("Deleted Records")
-        deleted_rows = backup_sheet.get_all_values()
+        storage = get_storage()
+        deleted_rows = storage.read_table(DELETED_SHEET) if DELETED_SHEET in storage.list_tables() else []
 
         if len(deleted_rows) <= 1:
             st.info("No deleted records available.")
@@ -273,38 +305,21 @@ def show():
             confirm_restore = st.checkbox("✅ I confirm I want to restore this record")
 
             if confirm_restore and st.button("↩️ Restore Selected Record"):
-                try:
-                    # Remove from deleted records
-                    backup_sheet.delete_rows(selected_index + 2)
-
-                    # Rebuild row: strip 'Deleted By', add 'Restored By'
-                    restored_row = selected_row.iloc[:-1].tolist()
-                    restored_row.append(st.session_state.username)
-
-                    # Append to active records
-                    sheet.append_row(restored_row)
-
-                    # Optional: log restoration
-                    try:
-                        log_sheet = spreadsheet.worksheet("Restoration Logs")
-                    except:
-                        log_sheet = spreadsheet.add_worksheet(title="Restoration Logs", rows="1000", cols="20")
-                        log_sheet.append_row(headers + ["Restored By", "Restored At"])
-
-                    restored_log_row = selected_row.tolist() + [
-                        st.session_state.username,
-                        str(datetime.datetime.now())
-                    ]
-                    log_sheet.append_row(restored_log_row)
-
+                # The frame keeps each record's position in Deleted Records.
+                # Restoring strips Deleted At, Source and Deleted By; the
+                # tombstone columns of the restored row stay empty.
+                message = restore_specific_deleted_record(
+                    int(selected_row.name),
+                    restored_by=st.session_state.username,
+                    expected=records[selected_row.name],
+                )
+                if message.startswith("✅"):
                     # Recompute if needed
                     handle_merge_logic()
-
                     st.success(f"🧠 Record restored by {st.session_state.username} and re-added successfully!")
-                    st.experimental_rerun()
-
-                except Exception as e:
-                    st.error(f"Failed to restore record: {e}")
+                    st.rerun()
+                else:
+                    st.error(message)
 
     except Exception as e:
         st.error(f"Failed to load deleted records: {e}")
@@ -1,9 +1,17 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from resource import spreadsheet
+from resource import apply_schema, drop_tombstones, sanitize_for_google_sheets, spreadsheet, upsert_rows
 from constants import MERGED_SHEET, CALC_SHEET, WEIGHTS_SHEET 
 from modules.authentication import require_role
+from modules.sheets_client import add_worksheet, get_worksheet
+from modules.pm25_engine import (
+    PM25_COL,
+    QA_STATUS_COL,
+    VOLUME_COL,
+    calculate_pm25,
+    pm25_sheet_column,
+)
 from gspread.exceptions import WorksheetNotFound
 
 def show():
@@ -32,9 +40,10 @@ def show():
 
     # Load merged sheet
     try:
-        raw_data = spreadsheet.worksheet(MERGED_SHEET).get_all_values()
+        raw_data = get_worksheet(spreadsheet, MERGED_SHEET).get_all_values()
         df_merged = pd.DataFrame(raw_data[1:], columns=raw_data[0])
         df_merged.columns = df_merged.columns.str.strip().str.replace('\s+', ' ', regex=True)
+        df_merged = apply_schema(drop_tombstones(df_merged))
 
         required_cols = {"Elapsed Time Diff (min)", "Average Flow Rate (L/min)", "Site", "Date_Start", "Time_Start"}
         if not required_cols.issubset(df_merged.columns):
@@ -91,23 +100,7 @@ def show():
     )
 
     # PM calculation
-    def calculate_pm(row):
-        try:
-            elapsed = float(row["Elapsed Time Diff (min)"])
-            flow = float(row["Average Flow Rate (L/min)"])
-            pre = float(row["Pre Weight (g)"])
-            post = float(row["Post Weight (g)"])
-            mass_mg = (post - pre) * 1000
-            if elapsed < 1200: return "Elapsed < 1200"
-            if flow <= 0.05: return "Invalid Flow"
-            if post < pre: return "Post < Pre"
-            volume_m3 = (flow * elapsed) / 1000
-            if volume_m3 == 0: return "Zero Volume"
-            return (mass_mg * 1000) / volume_m3
-        except Exception:
-            return "Error"
-
-    edited_df["PM₂.₅ (µg/m³)"] = edited_df.apply(calculate_pm, axis=1)
+    edited_df = calculate_pm25(edited_df)
 
     st.subheader("📊 Calculated Results")
     st.dataframe(edited_df, use_container_width=True)
@@ -119,8 +112,9 @@ def show():
     if st.button("🔄 Save or Update to Both Sheets"):
         try:
             sync_df = edited_df.copy()
-            for col in sync_df.select_dtypes(include=["datetime64[ns]", "datetime64"]):
-                sync_df[col] = sync_df[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+            # Keep the saved sheet layout: one PM column holding value or QA status.
+            sync_df[PM25_COL] = pm25_sheet_column(sync_df)
+            sync_df = sync_df.drop(columns=[VOLUME_COL, QA_STATUS_COL])
 
             # Clean weights
             sync_df = sync_df[(sync_df["Pre Weight (g)"] > 0) & (sync_df["Post Weight (g)"] > 0)].copy()
@@ -128,16 +122,22 @@ def show():
                 st.warning("⚠ No valid weight entries to sync.")
                 return
 
+            # Date_Start keeps its full timestamp text, which the saved rows
+            # are keyed on; the other typed columns go back to sheet text.
+            sync_df["Date_Start"] = sync_df["Date_Start"].dt.strftime("%Y-%m-%d %H:%M:%S")
+            sync_df = sanitize_for_google_sheets(sync_df)
+
             sync_df["Saved_At"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             sync_df["unique_key"] = sync_df["Site"].astype(str) + "_" + sync_df["Date_Start"].astype(str) + "_" + sync_df["Time_Start"].astype(str)
 
             def load_or_create_sheet(sheet_name, cols):
-                if sheet_name not in [ws.title for ws in spreadsheet.worksheets()]:
-                    ws = spreadsheet.add_worksheet(title=sheet_name, rows="1000", cols=str(len(cols)))
+                try:
+                    ws = get_worksheet(spreadsheet, sheet_name)
+                except WorksheetNotFound:
+                    ws = add_worksheet(spreadsheet, title=sheet_name, rows="1000", cols=str(len(cols)))
                     ws.append_row(cols)
                     return ws, {}
                 else:
-                    ws = spreadsheet.worksheet(sheet_name)
                     data = ws.get_all_values()
                     df = pd.DataFrame(data[1:], columns=data[0])
                     df["unique_key"] = df["Site"].astype(str) + "_" + df["Date_Start"].astype(str) + "_" + df["Time_Start"].astype(str)
@@ -148,18 +148,11 @@ def show():
             # Sync to Calculation Sheet
             calc_ws, calc_keys = load_or_create_sheet(CALC_SHEET, sync_df.drop(columns="unique_key").columns.tolist())
 
+            keys = sync_df["unique_key"].tolist()
+            rows = sync_df.drop(columns="unique_key").values.tolist()
+
             def sync_to_sheet(ws, keys_dict):
-                updated, added = 0, 0
-                for _, row in sync_df.iterrows():
-                    key = row["unique_key"]
-                    row_data = row.drop(labels="unique_key").tolist()
-                    if key in keys_dict:
-                        ws.update(f"A{keys_dict[key] + 2}", [row_data])
-                        updated += 1
-                    else:
-                        ws.append_row(row_data, value_input_option="USER_ENTERED")
-                        added += 1
-                return updated, added
+                return upsert_rows(ws, keys, rows, keys_dict)
 
             w_upd, w_add = sync_to_sheet(weights_ws, weights_keys)
             c_upd, c_add = sync_to_sheet(calc_ws, calc_keys)
@@ -174,7 +167,7 @@ def show():
     # Optional: Show saved weights
     if st.checkbox("📖 Show Saved Weights Sheet"):
         try:
-            saved_weights = spreadsheet.worksheet(WEIGHTS_SHEET).get_all_records(head=1)
+            saved_weights = get_worksheet(spreadsheet, WEIGHTS_SHEET).get_all_records(head=1)
             st.dataframe(pd.DataFrame(saved_weights), use_container_width=True)
         except Exception as e:
             st.warning(f"⚠ Could not load weights sheet: {e}")
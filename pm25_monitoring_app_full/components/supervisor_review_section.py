@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 from resource import (
-    load_data_from_sheet,
+    load_data_incremental,
     add_data,
     merge_start_stop,
     save_merged_data_to_sheet,
@@ -10,11 +10,13 @@ from resource import (
     filter_by_site_and_date,
     make_unique_headers,
     display_and_merge_data,
+    query_replica,
     sheet,
     spreadsheet
 )
 from modules.authentication import require_role
-from constants import MERGED_SHEET, CALC_SHEET
+from modules.sheets_client import get_worksheet
+from constants import MERGED_SHEET, CALC_SHEET, DELETED_SHEET
 from gspread.exceptions import APIError,WorksheetNotFound 
 
 
@@ -50,7 +52,7 @@ def show():
 
     # === Display Existing Data & Merge START/STOP ===
     st.header("📡 Submitted Monitoring Records")
-    df = load_data_from_sheet(sheet)
+    df = load_data_incremental(sheet)
     display_and_merge_data(df, spreadsheet, MERGED_SHEET)
     
 
@@ -58,28 +60,32 @@ def show():
     # --- View Saved Entries ---
     st.subheader("📂 View Saved PM₂.₅ Entries")
     try:
-        calc_data = spreadsheet.worksheet(CALC_SHEET).get_all_records()
-        df_calc = pd.DataFrame(calc_data)
-       
+        df_calc = query_replica(CALC_SHEET)
+        from_replica = df_calc is not None
+        if not from_replica:
+            df_calc = pd.DataFrame(get_worksheet(spreadsheet, CALC_SHEET).get_all_records())
 
         if not df_calc.empty:
-            df_calc["Date"] = pd.to_datetime(df_calc["Date_Start"], errors="coerce").dt.date
-            df_calc["PM₂.₅ (µg/m³)"] = pd.to_numeric(df_calc["PM₂.₅ (µg/m³)"], errors="coerce")
-
             with st.expander("🔍 Filter Saved Entries"):
                 selected_date = st.date_input("📅 Filter by Date", value=None)
                 selected_site = st.selectbox(
                     "📌 Filter by Site", 
-                    options=["All"] + sorted(df_calc["Site"].unique()),
+                    options=["All"] + sorted(df_calc["Site"].astype(str).unique()),
                     key="site_filter"
                 )
 
-            filtered_df = df_calc.copy()
-            if selected_date:
-                filtered_df = filtered_df[filtered_df["Date_Start"] == selected_date]
-            if selected_site != "All":
-                filtered_df = filtered_df[filtered_df["Site"] == selected_site]
-
+            date_range = (selected_date, selected_date) if selected_date else None
+            if from_replica:
+                filtered_df = query_replica(CALC_SHEET, selected_site, date_range, date_col="Date_Start")
+            else:
+                filtered_df = df_calc.copy()
+                filtered_df["Date"] = pd.to_datetime(filtered_df["Date_Start"], errors="coerce").dt.date
+                if selected_date:
+                    filtered_df = filtered_df[filtered_df["Date"] == selected_date]
+                if selected_site != "All":
+                    filtered_df = filtered_df[filtered_df["Site"].astype(str) == selected_site]
+
+            filtered_df["PM₂.₅ (µg/m³)"] = pd.to_numeric(filtered_df["PM₂.₅ (µg/m³)"], errors="coerce")
             st.dataframe(filtered_df, use_container_width=True)
         else:
             st.info("ℹ No saved entries yet.")
@@ -88,8 +94,11 @@ def show():
 
     with st.expander("👷🏾‍♂️ View Deleted Records"):
         try:
-            deleted_sheet = spreadsheet.worksheet("Deleted Records")
-            deleted_data = deleted_sheet.get_all_values()
+            df_deleted = query_replica(DELETED_SHEET, include_deleted=True)
+            if df_deleted is not None:
+                deleted_data = [df_deleted.columns.tolist()] + df_deleted.values.tolist()
+            else:
+                deleted_data = get_worksheet(spreadsheet, DELETED_SHEET).get_all_values()
 
             if len(deleted_data) > 1:
                 headers = make_unique_headers(deleted_data[0])
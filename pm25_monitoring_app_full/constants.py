@@ -3,6 +3,7 @@ MAIN_SHEET = 'Observations'
 MERGED_SHEET = 'Merged Records'
 WEIGHTS_SHEET = "Weights Sheet"
 CALC_SHEET = "PM Calculations"
+DELETED_SHEET = "Deleted Records"
 REG_REQUESTS_SHEET = "Registration Requests"
 USERS_SHEET = "Users"
 LOG_SHEET = "Registration Log"
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from modules.storage import staging_table
+
+DEFAULT_CHUNK_ROWS = 2000
+
+
+def payload_digest(values):
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode()).hexdigest()
+
+
+class WriteCheckpoints:
+    """Progress of chunked table writes, kept in a JSON file.
+
+    One entry per table: the digest of the values being written, the total
+    row count and how many rows have landed. The file survives restarts,
+    so a save cut short by an error or a crash can pick up where it left off.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save(self, data):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    def get(self, table):
+        with self._lock:
+            return self._load().get(table)
+
+    def put(self, table, state):
+        with self._lock:
+            data = self._load()
+            data[table] = state
+            self._save(data)
+
+    def clear(self, table):
+        with self._lock:
+            data = self._load()
+            if data.pop(table, None) is not None:
+                self._save(data)
+
+
+def write_table_chunked(storage, name, values, checkpoints, chunk_rows=DEFAULT_CHUNK_ROWS, on_progress=None):
+    """Replace table ``name`` with ``values``, ``chunk_rows`` rows per request.
+
+    The rows go to ``staging_table(name)`` first: the first block through
+    ``storage.write_table``, later blocks at their row numbers with
+    ``update_range``, so re-sending a block is harmless. Only when every
+    block has landed does ``storage.swap_table`` make the staging copy the
+    live table, so readers of ``name`` never see a partial write.
+
+    After each block the checkpoint is updated; a later call with the same
+    ``values`` skips the blocks already in staging. ``on_progress(rows_written,
+    total, rows_per_sec)`` is called after every block.
+
+    Returns a summary with rows, chunks, seconds, rows_per_sec and
+    resumed_from (the row count already in place when the call started).
+    """
+    chunk_rows = max(1, int(chunk_rows))
+    total = len(values)
+    digest = payload_digest(values)
+
+    staging = staging_table(name)
+
+    state = checkpoints.get(name)
+    done = 0
+    if (
+        state and state.get("digest") == digest and state.get("total") == total
+        and staging in storage.list_tables()
+    ):
+        done = min(int(state.get("rows_written", 0)), total)
+    resumed_from = done
+
+    started = time.perf_counter()
+    chunks = 0
+
+    def checkpoint():
+        checkpoints.put(name, {"digest": digest, "total": total, "rows_written": done})
+        if on_progress:
+            seconds = time.perf_counter() - started
+            on_progress(done, total, (done - resumed_from) / seconds if seconds else None)
+
+    if done == 0:
+        first = values[:chunk_rows]
+        storage.write_table(staging, first)
+        done = len(first)
+        chunks += 1
+        checkpoint()
+
+    while done < total:
+        block = values[done:done + chunk_rows]
+        storage.update_range(staging, f"A{done + 1}", block)
+        done += len(block)
+        chunks += 1
+        checkpoint()
+
+    storage.swap_table(staging, name)
+    checkpoints.clear(name)
+    seconds = time.perf_counter() - started
+    return {
+        "rows": total,
+        "chunks": chunks,
+        "seconds": seconds,
+        "rows_per_sec": (total - resumed_from) / seconds if seconds else None,
+        "resumed_from": resumed_from,
+    }
@@ -0,0 +1,192 @@
+import logging
+import random
+import smtplib
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+def connection_lost(error):
+    """True when the connection itself failed rather than the server refusing."""
+    # SMTPException subclasses OSError, so socket errors are the OSErrors
+    # that are not SMTP replies.
+    return isinstance(error, smtplib.SMTPServerDisconnected) or (
+        isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+    )
+
+
+def is_transient(error):
+    """True for failures worth retrying: dropped connections and 4xx replies."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return connection_lost(error)
+
+
+class EmailOutbox:
+    """Sends queued email from a background thread over one SMTP connection.
+
+    ``connect()`` must return a logged-in ``smtplib.SMTP`` (or SMTP_SSL);
+    the connection is kept open between batches and closed after
+    ``idle_timeout`` seconds without mail. Each ``submit`` returns a Future
+    that resolves to None once the server accepted the message. Messages
+    wait up to ``max_delay`` seconds so that a burst goes out together.
+    Transient failures are retried with jittered exponential backoff, up to
+    ``max_attempts`` sends per message; permanent (5xx) failures fail that
+    message's Future and the rest of the batch carries on.
+    """
+
+    def __init__(self, connect, max_batch=20, max_delay=0.5, idle_timeout=60.0,
+                 max_attempts=5, base_delay=2.0, max_backoff=120.0):
+        self.connect = connect
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.idle_timeout = idle_timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_backoff = max_backoff
+        self.last_error = None
+
+        self._pending = deque()  # [message, future, queued_at, attempts]
+        self._cond = threading.Condition()
+        self._retry_at = 0.0
+        self._server = None
+        self._last_used = 0.0
+        self._stats = {"sent": 0, "failed": 0, "retries": 0, "batches": 0, "connections": 0}
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def submit(self, message):
+        """Queue an ``email.message.Message`` for sending."""
+        future = Future()
+        with self._cond:
+            self._pending.append([message, future, time.monotonic(), 0])
+            self._cond.notify()
+        return future
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, pending=len(self._pending), connected=self._server is not None)
+
+    def flush(self, timeout=30.0):
+        """Wait until the queue is empty or ``timeout`` passes. Returns True if empty."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._retry_at = 0.0
+            self._cond.notify_all()
+            while self._pending:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(timeout=min(left, 0.1))
+            return True
+
+    # -- connection ------------------------------------------------------
+    def _open(self):
+        if self._server is None:
+            self._server = self.connect()
+            with self._cond:
+                self._stats["connections"] += 1
+        return self._server
+
+    def _close(self):
+        server, self._server = self._server, None
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                server.close()
+
+    # -- sending ---------------------------------------------------------
+    def _send(self, message):
+        # One reconnect per message: a pooled connection may have been
+        # dropped by the server while idle.
+        try:
+            self._open().send_message(message)
+        except Exception as e:
+            if not connection_lost(e):
+                raise
+            self._close()
+            self._open().send_message(message)
+        self._last_used = time.monotonic()
+
+    def _send_batch(self):
+        with self._cond:
+            batch = list(self._pending)[: self.max_batch]
+        if not batch:
+            return
+        with self._cond:
+            self._stats["batches"] += 1
+
+        for entry in batch:
+            message, future, _, attempts = entry
+            try:
+                self._send(message)
+            except Exception as e:
+                entry[3] = attempts + 1
+                if is_transient(e) and entry[3] < self.max_attempts:
+                    # Keep it (and everything behind it) queued for later.
+                    self.last_error = e
+                    self._close()
+                    delay = random.uniform(0, min(self.max_backoff, self.base_delay * 2 ** attempts))
+                    with self._cond:
+                        self._stats["retries"] += 1
+                        self._retry_at = time.monotonic() + delay
+                    logger.warning(
+                        "Sending email failed (attempt %d of %d), retrying in %.1fs: %s",
+                        entry[3], self.max_attempts, delay, e,
+                    )
+                    return
+                self._finish(entry, error=e)
+                logger.warning("Email failed after %d attempt(s)", entry[3], exc_info=True)
+                logger.debug("Failed email was addressed to %s", message["To"])
+                continue
+            self._finish(entry)
+
+    def _finish(self, entry, error=None):
+        with self._cond:
+            # Only the sender thread removes messages, so ``entry`` is at
+            # the head of the queue.
+            self._pending.popleft()
+            self._stats["failed" if error else "sent"] += 1
+            self._cond.notify_all()
+        if error is None:
+            entry[1].set_result(None)
+        else:
+            entry[1].set_exception(error)
+
+    def _due_in(self):
+        # Seconds until the next batch is due, or None when idle.
+        if not self._pending:
+            return None
+        now = time.monotonic()
+        if now < self._retry_at:
+            return self._retry_at - now
+        if len(self._pending) >= self.max_batch:
+            return 0
+        return max(0.0, self._pending[0][2] + self.max_delay - now)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                wait = self._due_in()
+                while wait is None or wait > 0:
+                    if wait is None and self._server is not None:
+                        # Idle: wake up to close the connection in time.
+                        wait = max(0.0, self._last_used + self.idle_timeout - time.monotonic())
+                        if wait == 0:
+                            break
+                    self._cond.wait(timeout=wait)
+                    wait = self._due_in()
+            if not self._pending and self._server is not None:
+                self._close()
+                continue
+            self._send_batch()
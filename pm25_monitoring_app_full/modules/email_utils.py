@@ -1,25 +1,56 @@
-import streamlit as st
+import atexit
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+import streamlit as st
+
+from modules.email_outbox import EmailOutbox
+from modules.fake_smtp import FakeSMTPServer
+
 EMAIL_SENDER = st.secrets["EMAIL_SENDER"]
 EMAIL_PASSWORD = st.secrets["EMAIL_PASSWORD"]
 
+
+@st.cache_resource
+def get_fake_smtp_server():
+    """Local stand-in SMTP server, enabled with the FAKE_SMTP secret."""
+    return FakeSMTPServer(port=int(st.secrets.get("FAKE_SMTP_PORT", 0)))
+
+
+def _connect():
+    # SMTP_HOST / SMTP_PORT / SMTP_SSL pick the server (default: Gmail over
+    # SSL); with SMTP_SSL off the connection is upgraded with STARTTLS.
+    if st.secrets.get("FAKE_SMTP", False):
+        fake = get_fake_smtp_server()
+        server = smtplib.SMTP(fake.host, fake.port, timeout=30)
+    else:
+        host = st.secrets.get("SMTP_HOST", "smtp.gmail.com")
+        use_ssl = st.secrets.get("SMTP_SSL", True)
+        port = int(st.secrets.get("SMTP_PORT", 465 if use_ssl else 587))
+        if use_ssl:
+            server = smtplib.SMTP_SSL(host, port, timeout=30)
+        else:
+            server = smtplib.SMTP(host, port, timeout=30)
+            server.starttls()
+    server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+    return server
+
+
+@st.cache_resource
+def get_outbox():
+    # Process-wide: one sender thread and one SMTP connection for every session.
+    outbox = EmailOutbox(_connect)
+    atexit.register(outbox.flush)
+    return outbox
+
+
 def send_email(recipient, subject, body):
-    try:
-        msg = MIMEMultipart()
-        msg["From"] = EMAIL_SENDER
-        msg["To"] = recipient
-        msg["Subject"] = subject
-
-        msg.attach(MIMEText(body, "plain"))
-
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_SENDER, recipient, msg.as_string())
-
-        return True
-    except Exception as e:
-        print(f"Email failed: {e}")
-        return False
+    """Queue an email; returns a Future that resolves once it was sent."""
+    msg = MIMEMultipart()
+    msg["From"] = EMAIL_SENDER
+    msg["To"] = recipient
+    msg["Subject"] = subject
+
+    msg.attach(MIMEText(body, "plain"))
+    return get_outbox().submit(msg)
@@ -0,0 +1,364 @@
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+
+import requests
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range, numericise_all, to_records
+
+# Methods that only read; everything else counts against the write quota.
+READ_METHODS = {
+    "get_all_values",
+    "get_all_records",
+    "row_values",
+    "col_values",
+    "batch_get",
+    "worksheet",
+    "worksheets",
+    "values_batch_get",
+}
+
+
+def _error_response(code, message, status):
+    response = requests.Response()
+    response.status_code = code
+    response._content = json.dumps({"error": {"code": code, "message": message, "status": status}}).encode()
+    return response
+
+
+def quota_error(retry_after=1.0):
+    """The APIError gspread raises for an HTTP 429 from the Sheets API."""
+    response = _error_response(429, "Quota exceeded (fake Sheets backend).", "RESOURCE_EXHAUSTED")
+    response.headers["Retry-After"] = str(retry_after)
+    return APIError(response)
+
+
+def _cell(value):
+    # What the API reads back for a RAW write: booleans as TRUE / FALSE,
+    # whole numbers without a trailing ".0".
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return "" if value is None else str(value)
+
+
+def _no_grid(i, kind, sheet_id):
+    return APIError(_error_response(
+        400, f"Invalid requests[{i}].{kind}: No grid with id: {sheet_id}", "INVALID_ARGUMENT"
+    ))
+
+
+def _update_properties(order, update, i=0):
+    # ``order`` is a list of [worksheet, title, hidden] in tab order.
+    properties = update["properties"]
+    fields = update["fields"].split(",")
+    entry = next((e for e in order if e[0].id == properties["sheetId"]), None)
+    if entry is None:
+        raise _no_grid(i, "updateSheetProperties", properties["sheetId"])
+    if "title" in fields and properties["title"] != entry[1]:
+        if any(e[1] == properties["title"] for e in order):
+            raise APIError(_error_response(
+                400, f'A sheet with the name "{properties["title"]}" already exists.', "INVALID_ARGUMENT"
+            ))
+        entry[1] = properties["title"]
+    if "hidden" in fields:
+        entry[2] = bool(properties["hidden"])
+    if "index" in fields:
+        order.remove(entry)
+        order.insert(min(properties["index"], len(order)), entry)
+
+
+class FakeSheetsAPI:
+    """Latency, quota and call accounting shared by a fake spreadsheet.
+
+    Every call sleeps ``latency`` plus up to ``jitter`` seconds and is
+    counted per method. More than ``reads_per_minute`` reads or
+    ``writes_per_minute`` writes in any 60 s window raise a 429 APIError
+    instead of running. ``runner(call, kind, method, sheet)`` wraps each
+    call, so the app's scheduler and tracing see it like a real request.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, reads_per_minute=None, writes_per_minute=None, runner=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.limits = {"read": reads_per_minute, "write": writes_per_minute}
+        self.runner = runner
+        self.calls = Counter()
+        self.throttled = Counter()
+        self._window = {"read": deque(), "write": deque()}
+        self._lock = threading.RLock()
+
+    def _attempt(self, method, kind, work):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            self.calls[method] += 1
+            limit = self.limits[kind]
+            if limit is not None:
+                window = self._window[kind]
+                now = time.monotonic()
+                while window and now - window[0] >= 60:
+                    window.popleft()
+                if len(window) >= limit:
+                    self.throttled[method] += 1
+                    raise quota_error(retry_after=round(60 - (now - window[0]), 3))
+                window.append(now)
+            return work()
+
+    def call(self, method, work, sheet=""):
+        kind = "read" if method in READ_METHODS else "write"
+        attempt = lambda: self._attempt(method, kind, work)
+        return self.runner(attempt, kind, method, sheet) if self.runner else attempt()
+
+    def stats(self):
+        with self._lock:
+            return {"calls": dict(self.calls), "throttled": dict(self.throttled)}
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.throttled.clear()
+
+
+class FakeWorksheet:
+    """In-memory stand-in for ``gspread.Worksheet`` (the subset this app uses)."""
+
+    def __init__(self, spreadsheet, title, sheet_id, rows=1000, cols=26, values=None):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.row_count = int(rows)
+        self.col_count = int(cols)
+        self.hidden = False
+        self._values = [[_cell(v) for v in row] for row in (values or [])]
+        self._grow(len(self._values), max((len(r) for r in self._values), default=0))
+
+    @property
+    def index(self):
+        return list(self.spreadsheet._sheets.values()).index(self)
+
+    def _call(self, method, work):
+        return self.spreadsheet.api.call(method, work, sheet=self.title)
+
+    def _grow(self, rows, cols):
+        self.row_count = max(self.row_count, rows)
+        self.col_count = max(self.col_count, cols)
+
+    def _grid(self):
+        # Trailing empty rows and columns are trimmed, as the API does.
+        rows = [list(row) for row in self._values]
+        for row in rows:
+            while row and row[-1] == "":
+                row.pop()
+        while rows and not rows[-1]:
+            rows.pop()
+        width = max((len(row) for row in rows), default=0)
+        return [row + [""] * (width - len(row)) for row in rows]
+
+    def _read_range(self, range_name):
+        grid = a1_range_to_grid_range(range_name.split("!")[-1])
+        rows = self._grid()
+        r0, r1 = grid.get("startRowIndex", 0), grid.get("endRowIndex", len(rows))
+        c0 = grid.get("startColumnIndex", 0)
+        c1 = grid.get("endColumnIndex", max((len(r) for r in rows), default=0))
+        block = [row[c0:c1] for row in rows[r0:r1]]
+        for row in block:
+            while row and row[-1] == "":
+                row.pop()
+        while block and not block[-1]:
+            block.pop()
+        return block
+
+    def _write(self, row0, col0, values):
+        if row0 + len(values) > self.row_count or col0 + max((len(r) for r in values), default=0) > self.col_count:
+            raise APIError(_error_response(400, "Range exceeds grid limits.", "INVALID_ARGUMENT"))
+        for i, new in enumerate(values):
+            while len(self._values) <= row0 + i:
+                self._values.append([])
+            row = self._values[row0 + i]
+            if len(row) < col0 + len(new):
+                row.extend([""] * (col0 + len(new) - len(row)))
+            row[col0:col0 + len(new)] = [_cell(v) for v in new]
+        self._grow(len(self._values), 0)
+
+    def get_all_values(self, *args, **kwargs):
+        return self._call("get_all_values", self._grid)
+
+    def get_all_records(self, head=1, default_blank="", numericise_ignore=(), empty2zero=False, **kwargs):
+        def work():
+            values = self._grid()
+            if len(values) < head:
+                return []
+            keys = values[head - 1]
+            rows = [
+                numericise_all(row, empty2zero, default_blank, False, list(numericise_ignore))
+                for row in values[head:]
+            ]
+            return to_records(keys, rows)
+        return self._call("get_all_records", work)
+
+    def row_values(self, row, **kwargs):
+        def work():
+            grid = self._grid()
+            values = list(grid[row - 1]) if row <= len(grid) else []
+            while values and values[-1] == "":
+                values.pop()
+            return values
+        return self._call("row_values", work)
+
+    def col_values(self, col, **kwargs):
+        def work():
+            values = [row[col - 1] if len(row) >= col else "" for row in self._grid()]
+            while values and values[-1] == "":
+                values.pop()
+            return values
+        return self._call("col_values", work)
+
+    def batch_get(self, ranges, **kwargs):
+        return self._call("batch_get", lambda: [self._read_range(r) for r in ranges])
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        def work():
+            start = len(self._grid())
+            self._values = self._values[:start]
+            for row in values:
+                self._values.append([_cell(v) for v in row])
+            self._grow(len(self._values), max((len(r) for r in values), default=0))
+            return {"updates": {"updatedRows": len(values)}}
+        return self._call("append_rows", work)
+
+    def update(self, values=None, range_name=None, **kwargs):
+        if isinstance(values, str) and isinstance(range_name, (list, tuple)):
+            # Old gspread argument order: update(range_name, values).
+            values, range_name = range_name, values
+
+        def work():
+            grid = a1_range_to_grid_range((range_name or "A1").split("!")[-1])
+            self._write(grid.get("startRowIndex", 0), grid.get("startColumnIndex", 0), values)
+            return {"updatedRows": len(values)}
+        return self._call("update", work)
+
+    def update_cell(self, row, col, value):
+        return self._call("update_cell", lambda: self._write(row - 1, col - 1, [[value]]))
+
+    def batch_update(self, data, **kwargs):
+        def work():
+            for item in data:
+                grid = a1_range_to_grid_range(item["range"].split("!")[-1])
+                self._write(grid.get("startRowIndex", 0), grid.get("startColumnIndex", 0), item["values"])
+            return {"totalUpdatedRows": sum(len(item["values"]) for item in data)}
+        return self._call("batch_update", work)
+
+    def delete_rows(self, start_index, end_index=None):
+        def work():
+            del self._values[start_index - 1:end_index or start_index]
+            self.row_count -= (end_index or start_index) - start_index + 1
+        return self._call("delete_rows", work)
+
+    def add_cols(self, cols):
+        def work():
+            self.col_count += cols
+        return self._call("add_cols", work)
+
+    def add_rows(self, rows):
+        def work():
+            self.row_count += rows
+        return self._call("add_rows", work)
+
+    def clear(self):
+        def work():
+            self._values = []
+        return self._call("clear", work)
+
+
+class FakeSpreadsheet:
+    """In-memory stand-in for ``gspread.Spreadsheet``.
+
+    ``tables`` seeds worksheets as ``{title: rows}``; ``api`` carries the
+    latency, quota and counters for every call on it and its worksheets.
+    """
+
+    def __init__(self, tables=None, api=None, spreadsheet_id="fake-spreadsheet"):
+        self.id = spreadsheet_id
+        self.api = api or FakeSheetsAPI()
+        self._ids = itertools.count(1)
+        self._sheets = {}
+        for title, values in (tables or {}).items():
+            self._sheets[title] = FakeWorksheet(self, title, next(self._ids), values=values)
+
+    def worksheet(self, title):
+        def work():
+            if title not in self._sheets:
+                raise WorksheetNotFound(title)
+            return self._sheets[title]
+        return self.api.call("worksheet", work, sheet=title)
+
+    def worksheets(self, *args, **kwargs):
+        return self.api.call("worksheets", lambda: list(self._sheets.values()))
+
+    def add_worksheet(self, title, rows=1000, cols=26, index=None):
+        def work():
+            if title in self._sheets:
+                raise APIError(_error_response(
+                    400, f'A sheet with the name "{title}" already exists.', "INVALID_ARGUMENT"
+                ))
+            self._sheets[title] = FakeWorksheet(self, title, next(self._ids), rows, cols)
+            return self._sheets[title]
+        return self.api.call("add_worksheet", work, sheet=title)
+
+    def del_worksheet(self, worksheet):
+        return self.api.call("del_worksheet", lambda: self._sheets.pop(worksheet.title, None), sheet=worksheet.title)
+
+    def batch_update(self, body):
+        def work():
+            # Worked out on a copy of the sheet list first, so a failing
+            # request changes nothing, as with the real API.
+            order = [[ws, ws.title, ws.hidden] for ws in self._sheets.values()]
+            deletes = []
+            for i, request in enumerate(body.get("requests", [])):
+                if "deleteDimension" in request:
+                    grid = request["deleteDimension"]["range"]
+                    if not any(e[0].id == grid["sheetId"] for e in order):
+                        raise _no_grid(i, "deleteDimension", grid["sheetId"])
+                    deletes.append((grid["sheetId"], grid["startIndex"], grid["endIndex"]))
+                elif "updateSheetProperties" in request:
+                    _update_properties(order, request["updateSheetProperties"], i)
+                else:
+                    raise NotImplementedError(f"Fake batch_update does not support {list(request)}")
+
+            for ws, title, hidden in order:
+                ws.title, ws.hidden = title, hidden
+            self._sheets = {ws.title: ws for ws, _, _ in order}
+            by_id = {ws.id: ws for ws in self._sheets.values()}
+            for sheet_id, start, end in deletes:
+                ws = by_id[sheet_id]
+                del ws._values[start:end]
+                ws.row_count -= end - start
+            return {"replies": [{} for _ in body.get("requests", [])]}
+        return self.api.call("spreadsheet.batch_update", work)
+
+    def values_batch_get(self, ranges, params=None):
+        def work():
+            value_ranges = []
+            for name in ranges:
+                title, _, cells = name.partition("!")
+                ws = self._sheets[title.strip("'")]
+                values = ws._read_range(cells) if cells else ws._grid()
+                value_ranges.append({"range": name, "values": values})
+            return {"spreadsheetId": self.id, "valueRanges": value_ranges}
+        titles = ", ".join(sorted({name.partition("!")[0].strip("'") for name in ranges}))
+        return self.api.call("values_batch_get", work, sheet=titles)
+
+    def dump(self):
+        """{title: values} of every worksheet, without counting as a call."""
+        return {title: ws._grid() for title, ws in self._sheets.items()}
+
@@ -0,0 +1,106 @@
+import email
+import socketserver
+import threading
+from collections import deque
+
+
+class _Session(socketserver.StreamRequestHandler):
+    # Just enough ESMTP for smtplib: EHLO, AUTH PLAIN, MAIL, RCPT, DATA.
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server.fake
+        server._record("connections")
+        self.reply("220 fake-smtp ESMTP")
+        mail_from, rcpt_to = None, []
+        for raw in self.rfile:
+            line = raw.decode(errors="replace").rstrip("\r\n")
+            verb, _, arg = line.partition(" ")
+            verb = verb.upper()
+
+            if verb == "EHLO":
+                self.reply("250-fake-smtp")
+                self.reply("250-AUTH PLAIN")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 fake-smtp")
+            elif verb == "AUTH":
+                server._record("logins")
+                self.reply("235 Authentication successful")
+            elif verb == "MAIL":
+                failure = server._take_failure()
+                if failure:
+                    self.reply(failure)
+                    continue
+                mail_from, rcpt_to = arg.partition(":")[2].strip().strip("<>"), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                rcpt_to.append(arg.partition(":")[2].strip().strip("<>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                body = []
+                for data_line in self.rfile:
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    body.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                server._deliver(mail_from, rcpt_to, b"".join(body))
+                self.reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeSMTPServer:
+    """Local SMTP server that keeps every message it receives in memory.
+
+    Listens on ``host``/``port`` (port 0 picks a free one; see ``port``),
+    accepts any login over plain SMTP and stores each message as an
+    ``email.message.Message`` in ``messages``. ``fail_next`` makes the next
+    transactions fail with the given reply, to exercise retries.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.messages = []
+        self.counts = {"connections": 0, "logins": 0}
+        self._failures = deque()
+        self._lock = threading.Lock()
+
+        self._server = _Server((host, port), _Session)
+        self._server.fake = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-smtp", daemon=True)
+        self._thread.start()
+
+    def fail_next(self, count=1, reply="451 Temporary local problem"):
+        with self._lock:
+            self._failures.extend([reply] * count)
+
+    def _take_failure(self):
+        with self._lock:
+            return self._failures.popleft() if self._failures else None
+
+    def _record(self, counter):
+        with self._lock:
+            self.counts[counter] += 1
+
+    def _deliver(self, mail_from, rcpt_to, data):
+        message = email.message_from_bytes(data)
+        message.envelope = (mail_from, list(rcpt_to))
+        with self._lock:
+            self.messages.append(message)
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,95 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+# bcrypt's default cost, as used by streamlit-authenticator's Hasher.
+DEFAULT_ROUNDS = 12
+
+
+class HasherBusy(RuntimeError):
+    """Raised by ``hash`` when ``max_pending`` jobs are already waiting."""
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing on a small worker pool.
+
+    bcrypt releases the GIL, so ``workers`` threads use at most that many
+    cores however many sessions register or reset passwords at once. This
+    bounds CPU only: a caller that waits on the Future still blocks for
+    its queueing plus one bcrypt round. At most ``max_pending`` jobs may be
+    queued or running; beyond that ``hash`` raises HasherBusy instead of
+    growing the queue. Hashes are standard
+    ``$2b$`` strings, so streamlit-authenticator's login checks them as
+    before.
+    """
+
+    def __init__(self, workers=2, rounds=DEFAULT_ROUNDS, max_pending=32):
+        self.workers = workers
+        self.rounds = rounds
+        self.max_pending = max_pending
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._stats = {"completed": 0, "failed": 0, "rejected": 0, "peak_pending": 0,
+                       "wait_seconds": 0.0, "work_seconds": 0.0}
+
+    def _submit(self, work):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise HasherBusy(f"{self._pending} password jobs already queued")
+            self._pending += 1
+            self._stats["peak_pending"] = max(self._stats["peak_pending"], self._pending)
+        queued_at = time.monotonic()
+
+        def job():
+            started = time.monotonic()
+            with self._lock:
+                self._running += 1
+                self._stats["wait_seconds"] += started - queued_at
+            ok = False
+            try:
+                result = work()
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._stats["completed" if ok else "failed"] += 1
+                    self._stats["work_seconds"] += time.monotonic() - started
+
+        try:
+            future = self._pool.submit(job)
+        except RuntimeError:
+            self._release()
+            raise
+        # Also runs for jobs cancelled before they started.
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def hash(self, password):
+        """Future resolving to the bcrypt hash of ``password`` as a str."""
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._submit(lambda: bcrypt.hashpw(password.encode(), salt).decode())
+
+    def stats(self):
+        """Queue depth and timing counters since the pool started."""
+        with self._lock:
+            stats = dict(self._stats)
+            queued = self._pending - self._running
+            stats.update(queued=queued, running=self._running, workers=self.workers, rounds=self.rounds)
+        done = max(1, stats["completed"] + stats["failed"])
+        stats["avg_wait_seconds"] = round(stats.pop("wait_seconds") / done, 3)
+        stats["avg_work_seconds"] = round(stats.pop("work_seconds") / done, 3)
+        return stats
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
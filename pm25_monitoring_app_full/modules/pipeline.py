@@ -0,0 +1,558 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+
+# =========================================================
+# SCHEMA
+# =========================================================
+OBSERVATION_COLUMNS = [
+    "Entry Type",
+    "ID",
+    "Site",
+    "Latitude",
+    "Longitude",
+    "Monitoring Officer",
+    "Driver",
+    "Date",
+    "Time",
+    "Temperature (°C)",
+    "RH (%)",
+    "Pressure (mbar)",
+    "Weather",
+    "Wind Speed",
+    "Wind Direction",
+    "Elapsed Time (min)",
+    "Flow Rate (L/min)",
+    "Observation",
+    "Submitted By",
+    "Submitted At",
+]
+
+# Soft-delete markers written in place of physically removing a row.
+TOMBSTONE_COLUMNS = ["Deleted", "Deleted By", "Deleted At"]
+TOMBSTONE_FLAG = "TRUE"
+
+# Unique token stamped on each submitted row, after the tombstone columns,
+# so a retried append can tell whether the row already reached the sheet.
+WRITE_ID_COLUMN = "Write ID"
+
+# Declared types of the Observations columns; Merged Records columns are
+# the same names with a _Start / _Stop suffix plus the two derived numbers.
+# ID, Latitude and Longitude stay text: they are merge keys and must pair
+# exactly as written.
+SHEETS_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATETIME_FORMATS = {
+    "Date": "%Y-%m-%d",
+    "Submitted At": SHEETS_DATETIME_FORMAT,
+}
+NUMERIC_COLUMNS = [
+    "Temperature (°C)",
+    "RH (%)",
+    "Pressure (mbar)",
+    "Wind Speed",
+    "Elapsed Time (min)",
+    "Flow Rate (L/min)",
+    "Elapsed Time Diff (min)",
+    "Average Flow Rate (L/min)",
+]
+CATEGORY_COLUMNS = ["Site", "Entry Type", "Weather", "Wind Direction"]
+TEXT_COLUMNS = [
+    "ID",
+    "Latitude",
+    "Longitude",
+    "Monitoring Officer",
+    "Driver",
+    "Time",
+    "Observation",
+    "Submitted By",
+    WRITE_ID_COLUMN,
+] + TOMBSTONE_COLUMNS
+
+
+def _arrow_string_dtype():
+    # Arrow-backed strings with NaN for missing values, like plain object
+    # columns: pandas >= 2.3 spells it one way, 2.1 / 2.2 another.
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:
+        pass
+    try:
+        return pd.StringDtype("pyarrow_numpy")
+    except (TypeError, ValueError):
+        return None
+
+
+TEXT_DTYPE = _arrow_string_dtype()
+
+
+# =========================================================
+# GENERAL UTILITIES
+# =========================================================
+def convert_timestamps_to_string(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    for col in df.select_dtypes(include=["datetime64[ns]", "datetime64[ns, UTC]"]).columns:
+        df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return df
+
+
+def _base_column(col):
+    for suffix in ("_Start", "_Stop"):
+        if col.endswith(suffix):
+            return col[: -len(suffix)]
+    return col
+
+
+def datetime_format(col):
+    """Sheet text format of a datetime column, e.g. "Date_Start" -> "%Y-%m-%d"."""
+    return DATETIME_FORMATS.get(_base_column(str(col)), SHEETS_DATETIME_FORMAT)
+
+
+def _parse_datetimes(values, fmt):
+    parsed = pd.to_datetime(values, format=fmt, errors="coerce")
+    # Cells typed into the sheet by hand may use another layout; only those
+    # go through the slower format inference.
+    retry = parsed.isna() & values.astype(str).str.strip().ne("")
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], format="mixed", errors="coerce")
+    return parsed
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of ``df`` with the declared column types; other columns are untouched.
+
+    Dates become datetime64, measurements float64 (blank -> NaN), the few
+    repeated labels categoricals, and text Arrow strings when pyarrow is
+    installed. ``sanitize_for_google_sheets`` turns them back into sheet text.
+    """
+    df = df.copy()
+    for col in df.columns:
+        base = _base_column(str(col))
+        s = df[col]
+        if base in DATETIME_FORMATS:
+            if not pd.api.types.is_datetime64_any_dtype(s):
+                df[col] = _parse_datetimes(s, DATETIME_FORMATS[base])
+        elif base in NUMERIC_COLUMNS:
+            if not pd.api.types.is_float_dtype(s):
+                df[col] = pd.to_numeric(s, errors="coerce").astype("float64")
+        elif base in CATEGORY_COLUMNS:
+            if not isinstance(s.dtype, pd.CategoricalDtype):
+                df[col] = s.astype("category")
+        elif base in TEXT_COLUMNS and TEXT_DTYPE is not None:
+            df[col] = s.astype(TEXT_DTYPE)
+    return df
+
+
+def concat_typed(frames):
+    """``pd.concat`` that keeps categorical columns categorical."""
+    frames = [f for f in frames if not f.empty] or frames[:1]
+    if len(frames) > 1:
+        for col in frames[0].columns:
+            if all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames if col in f):
+                categories = pd.api.types.union_categoricals(
+                    [f[col] for f in frames if col in f]
+                ).categories
+                frames = [
+                    f.assign(**{col: f[col].cat.set_categories(categories)}) if col in f else f
+                    for f in frames
+                ]
+    return pd.concat(frames)
+
+
+def sheet_text(col, value):
+    """The text a typed cell of column ``col`` reads back as from the sheet."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, pd.Timestamp):
+        return value.strftime(datetime_format(col))
+    return str(value)
+
+
+def make_unique_headers(headers):
+    seen = {}
+    unique_headers = []
+
+    for h in headers:
+        if h == "":
+            h = "Unnamed"
+
+        if h in seen:
+            seen[h] += 1
+            unique_headers.append(f"{h}.{seen[h]}")
+        else:
+            seen[h] = 0
+            unique_headers.append(h)
+
+    return unique_headers
+
+
+def _tombstone_mask(df):
+    if TOMBSTONE_COLUMNS[0] not in df.columns:
+        return pd.Series(False, index=df.index)
+    return df[TOMBSTONE_COLUMNS[0]].astype(str).str.strip().str.upper() == TOMBSTONE_FLAG
+
+
+def drop_tombstones(df):
+    """Live rows only, without the tombstone and Write ID columns; index labels are kept."""
+    if TOMBSTONE_COLUMNS[0] not in df.columns:
+        return df.drop(columns=[WRITE_ID_COLUMN], errors="ignore")
+    live_cols = [col for col in df.columns if col not in TOMBSTONE_COLUMNS + [WRITE_ID_COLUMN]]
+    return df.loc[~_tombstone_mask(df), live_cols]
+
+
+def tombstoned_rows(df):
+    return df.loc[_tombstone_mask(df)]
+
+
+# =========================================================
+# FILTERING
+# =========================================================
+def filter_records(df, site_filter=None, date_range=None):
+    if df.empty:
+        return df
+
+    df = df.copy()
+
+    if "Submitted At" in df.columns:
+        df["Submitted At"] = pd.to_datetime(df["Submitted At"], errors="coerce")
+
+    if site_filter and site_filter != "All" and "Site" in df.columns:
+        df = df[df["Site"] == site_filter]
+
+    if date_range and len(date_range) == 2 and "Submitted At" in df.columns:
+        start, end = date_range
+        days = df["Submitted At"].dt.normalize()
+        df = df[(days >= pd.Timestamp(start)) & (days <= pd.Timestamp(end))]
+
+    return df
+
+
+def filter_site_day(df, site, day, site_col="Site", date_col="Submitted At"):
+    """Rows of ``site`` (unless "All") whose ``date_col`` falls on ``day``."""
+    days = pd.to_datetime(df[date_col], errors="coerce").dt.normalize()
+    mask = days == pd.Timestamp(day)
+    if site and site != "All":
+        mask &= df[site_col].astype(str) == site
+    return df[mask]
+
+
+class SiteDayIndex:
+    """Row positions of one version of a frame, keyed by (site, day).
+
+    Rows are sorted once by site then day, and once by day alone, so a
+    site, a day or a day range is a binary search instead of a scan.
+    ``positions`` returns row positions in their original order; rows with
+    no parseable date only match when no date is selected.
+    """
+
+    def __init__(self, df, site_col="Site", date_col="Submitted At"):
+        self.labels = df.index
+        self.n_rows = len(df)
+
+        codes, uniques = pd.factorize(df[site_col], sort=True)
+        self.sites = sorted(str(site) for site in uniques)
+        self._codes = {str(site): code for code, site in enumerate(uniques)}
+
+        dates = df[date_col]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, errors="coerce")
+        valid = dates.notna().to_numpy()
+        days = np.full(self.n_rows, np.iinfo(np.int64).min)
+        days[valid] = dates[valid].to_numpy().astype("datetime64[D]").astype(np.int64)
+
+        with_day = np.flatnonzero(valid)
+        order = with_day[np.argsort(days[with_day], kind="stable")]
+        self._by_day, self._days = order, days[order]
+
+        with_site = np.flatnonzero(codes >= 0)
+        order = with_site[np.lexsort((days[with_site], codes[with_site]))]
+        self._by_site, self._site_codes, self._site_days = order, codes[order], days[order]
+
+    @staticmethod
+    def _day(value):
+        return np.datetime64(pd.Timestamp(value).date(), "D").astype(np.int64)
+
+    def date_bounds(self):
+        """(first, last) date present, or None when no row has a date."""
+        if not len(self._days):
+            return None
+        first, last = self._days[[0, -1]].astype("datetime64[D]")
+        return pd.Timestamp(first).date(), pd.Timestamp(last).date()
+
+    def positions(self, site=None, start=None, end=None):
+        """Positions of rows at ``site`` (None or "All": any) with a date in [start, end]."""
+        dated = start is not None and end is not None
+        if not site or site == "All":
+            if not dated:
+                return np.arange(self.n_rows)
+            lo = np.searchsorted(self._days, self._day(start), "left")
+            hi = np.searchsorted(self._days, self._day(end), "right")
+            return np.sort(self._by_day[lo:hi])
+
+        code = self._codes.get(str(site))
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        first = np.searchsorted(self._site_codes, code, "left")
+        last = np.searchsorted(self._site_codes, code, "right")
+        if dated:
+            block = self._site_days[first:last]
+            first, last = (
+                first + np.searchsorted(block, self._day(start), "left"),
+                first + np.searchsorted(block, self._day(end), "right"),
+            )
+        return np.sort(self._by_site[first:last])
+
+
+# =========================================================
+# MERGE LOGIC
+# =========================================================
+MERGE_KEYS = ["ID", "Site", "Latitude", "Longitude"]
+
+MERGED_COLUMNS = [
+    "ID",
+    "Site",
+    "Latitude",
+    "Longitude",
+    "Entry Type_Start",
+    "Monitoring Officer_Start",
+    "Driver_Start",
+    "Date_Start",
+    "Time_Start",
+    "Temperature (°C)_Start",
+    "RH (%)_Start",
+    "Pressure (mbar)_Start",
+    "Weather_Start",
+    "Wind Speed_Start",
+    "Wind Direction_Start",
+    "Elapsed Time (min)_Start",
+    "Flow Rate (L/min)_Start",
+    "Observation_Start",
+    "Submitted At_Start",
+    "Entry Type_Stop",
+    "Monitoring Officer_Stop",
+    "Driver_Stop",
+    "Date_Stop",
+    "Time_Stop",
+    "Temperature (°C)_Stop",
+    "RH (%)_Stop",
+    "Pressure (mbar)_Stop",
+    "Weather_Stop",
+    "Wind Speed_Stop",
+    "Wind Direction_Stop",
+    "Elapsed Time (min)_Stop",
+    "Flow Rate (L/min)_Stop",
+    "Observation_Stop",
+    "Submitted At_Stop",
+    "Elapsed Time Diff (min)",
+    "Average Flow Rate (L/min)",
+]
+
+
+def pair_start_stop(df):
+    """Pair START and STOP rows per key; keeps every suffixed source column."""
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+    df = drop_tombstones(df)
+
+    required_cols = MERGE_KEYS + ["Entry Type"]
+    if any(col not in df.columns for col in required_cols):
+        return pd.DataFrame()
+
+    start_df = df[df["Entry Type"].astype(str).str.upper() == "START"].copy()
+    stop_df = df[df["Entry Type"].astype(str).str.upper() == "STOP"].copy()
+
+    if start_df.empty or stop_df.empty:
+        return pd.DataFrame()
+
+    start_df = start_df.reset_index(drop=True)
+    stop_df = stop_df.reset_index(drop=True)
+
+    start_df["seq"] = start_df.groupby(MERGE_KEYS, observed=True).cumcount() + 1
+    stop_df["seq"] = stop_df.groupby(MERGE_KEYS, observed=True).cumcount() + 1
+
+    start_df = start_df.rename(
+        columns=lambda x: f"{x}_Start" if x not in MERGE_KEYS + ["seq"] else x
+    )
+    stop_df = stop_df.rename(
+        columns=lambda x: f"{x}_Stop" if x not in MERGE_KEYS + ["seq"] else x
+    )
+
+    merged = pd.merge(start_df, stop_df, on=MERGE_KEYS + ["seq"], how="inner")
+
+    if "Elapsed Time (min)_Start" in merged.columns and "Elapsed Time (min)_Stop" in merged.columns:
+        merged["Elapsed Time (min)_Start"] = pd.to_numeric(
+            merged["Elapsed Time (min)_Start"], errors="coerce"
+        )
+        merged["Elapsed Time (min)_Stop"] = pd.to_numeric(
+            merged["Elapsed Time (min)_Stop"], errors="coerce"
+        )
+        merged["Elapsed Time Diff (min)"] = (
+            merged["Elapsed Time (min)_Stop"] - merged["Elapsed Time (min)_Start"]
+        )
+
+    flow_start_col = "Flow Rate (L/min)_Start"
+    flow_stop_col = "Flow Rate (L/min)_Stop"
+
+    if flow_start_col in merged.columns and flow_stop_col in merged.columns:
+        merged[flow_start_col] = pd.to_numeric(merged[flow_start_col], errors="coerce")
+        merged[flow_stop_col] = pd.to_numeric(merged[flow_stop_col], errors="coerce")
+        merged["Average Flow Rate (L/min)"] = (
+            merged[flow_start_col] + merged[flow_stop_col]
+        ) / 2
+
+    if "seq" in merged.columns:
+        merged = merged.drop(columns=["seq"])
+
+    return merged
+
+
+def merge_start_stop(df):
+    merged = pair_start_stop(df)
+    existing_cols = [col for col in MERGED_COLUMNS if col in merged.columns]
+    return merged[existing_cols]
+
+
+# Holds each Observations row's position while it is paired, so the
+# incremental merge knows which rows a pair consumed.
+SOURCE_ROW_COL = "_source_row"
+
+
+def pair_with_sources(work):
+    """``merge_start_stop(work)`` plus the SOURCE_ROW_COL values of the rows it paired."""
+    paired = pair_start_stop(work)
+    if paired.empty:
+        return pd.DataFrame(), np.empty(0, dtype=np.int64)
+    merged = paired[[col for col in MERGED_COLUMNS if col in paired.columns]]
+    sources = np.concatenate([
+        paired[f"{SOURCE_ROW_COL}_Start"].to_numpy(),
+        paired[f"{SOURCE_ROW_COL}_Stop"].to_numpy(),
+    ])
+    return merged.reset_index(drop=True), sources
+
+
+def pair_new_rows(work, pending, n_seen):
+    """Pairs added to ``merge_start_stop(work)`` by the rows after the first ``n_seen``.
+
+    ``work`` has SOURCE_ROW_COL set to each row's position; ``pending`` are
+    the positions among the first ``n_seen`` rows that were left unpaired.
+    Paired rows are always the first STARTs and STOPs of their key, so the
+    pending and new rows alone pair the same way the full table does.
+    Returns (new merged rows, positions still unpaired).
+    """
+    candidates = np.union1d(pending, np.arange(n_seen, len(work)))
+    merged, sources = pair_with_sources(work.iloc[candidates])
+    return merged, np.setdiff1d(candidates, sources)
+
+
+# =========================================================
+# GOOGLE SHEETS JSON-SAFE SANITIZING
+# =========================================================
+def _clean_cell(x):
+    if x is None:
+        return ""
+
+    if isinstance(x, np.generic):
+        x = x.item()
+
+    try:
+        if pd.isna(x):
+            return ""
+    except Exception:
+        pass
+
+    if isinstance(x, pd.Timestamp):
+        return "" if pd.isna(x) else x.strftime(SHEETS_DATETIME_FORMAT)
+
+    if isinstance(x, float):
+        if math.isnan(x) or math.isinf(x):
+            return ""
+        return x
+
+    if isinstance(x, (str, int, bool)):
+        return x
+
+    return str(x)
+
+
+def _sanitize_column(s, fmt=SHEETS_DATETIME_FORMAT):
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.strftime(fmt).astype(object).fillna("").infer_objects()
+
+    if isinstance(s.dtype, np.dtype) and s.dtype.kind == "b":
+        return s
+
+    if isinstance(s.dtype, np.dtype) and s.dtype.kind in "iu":
+        return s.astype("int64")
+
+    if isinstance(s.dtype, np.dtype) and s.dtype.kind == "f":
+        values = s.to_numpy(dtype="float64")
+        finite = np.isfinite(values)
+        if finite.all():
+            return s.astype("float64")
+        out = values.astype(object)
+        out[~finite] = ""
+        return pd.Series(out, index=s.index).infer_objects()
+
+    # Object and extension columns: blank the missing values in one pass,
+    # then only fall back to per-cell cleaning for what isn't already a str.
+    out = s.to_numpy(dtype=object, copy=True)
+    missing = pd.isna(out)
+    out[missing] = ""
+    rest = np.flatnonzero(~missing)
+    if len(rest) and pd.api.types.infer_dtype(out[rest], skipna=False) != "string":
+        out[rest] = [_clean_cell(x) for x in out[rest]]
+    return pd.Series(out, index=s.index).infer_objects()
+
+
+def sanitize_for_google_sheets(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of ``df`` holding only str, int, finite float and bool cells."""
+    if df.empty:
+        clean = df.astype(object)
+        clean.columns = [str(c) for c in df.columns]
+        return clean
+
+    clean = pd.DataFrame(
+        {i: _sanitize_column(df.iloc[:, i], datetime_format(col)) for i, col in enumerate(df.columns)},
+        index=df.index,
+    )
+    clean.columns = [str(c) for c in df.columns]
+    return clean
+
+
+def find_invalid_json_cell(df: pd.DataFrame):
+    """(row, column, value) of the first cell JSON can't encode, by position, or None.
+
+    Checks a sanitized frame column by column instead of ``json.dumps``-ing
+    every value.
+    """
+    for c in range(df.shape[1]):
+        s = df.iloc[:, c]
+        if isinstance(s.dtype, np.dtype) and s.dtype.kind in "biu":
+            continue
+        if isinstance(s.dtype, np.dtype) and s.dtype.kind == "f":
+            bad = ~np.isfinite(s.to_numpy(dtype="float64"))
+        else:
+            values = s.to_numpy(dtype=object)
+            if pd.api.types.infer_dtype(values, skipna=False) in ("string", "boolean", "integer", "empty"):
+                continue
+            bad = np.array([not _json_safe(x) for x in values], dtype=bool)
+        if bad.any():
+            r = int(np.argmax(bad))
+            return r, c, s.iloc[r]
+    return None
+
+
+def _json_safe(x):
+    if isinstance(x, float):
+        return math.isfinite(x)
+    return x is None or isinstance(x, (str, int, bool))
+
+
+def validate_json_payload(values):
+    json.dumps({"values": values}, allow_nan=False)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+ELAPSED_COL = "Elapsed Time Diff (min)"
+FLOW_COL = "Average Flow Rate (L/min)"
+PRE_WEIGHT_COL = "Pre Weight (g)"
+POST_WEIGHT_COL = "Post Weight (g)"
+
+VOLUME_COL = "Sampled Volume (m³)"
+PM25_COL = "PM₂.₅ (µg/m³)"
+QA_STATUS_COL = "QA Status"
+
+MIN_ELAPSED_MIN = 1200
+MIN_FLOW_LPM = 0.05
+
+QA_OK = "OK"
+QA_STATUSES = [QA_OK, "Error", "Elapsed < 1200", "Invalid Flow", "Post < Pre", "Zero Volume"]
+
+
+def _as_float(df, col):
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64")
+
+
+def calculate_pm25(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of ``df`` with sampled volume, PM₂.₅ and QA status columns.
+
+    Rows that fail a QA check get NaN concentration and the reason in
+    ``QA Status``; the checks and their order match the original per-row
+    calculation.
+    """
+    elapsed = _as_float(df, ELAPSED_COL)
+    flow = _as_float(df, FLOW_COL)
+    pre = _as_float(df, PRE_WEIGHT_COL)
+    post = _as_float(df, POST_WEIGHT_COL)
+
+    volume_m3 = flow * elapsed / 1000
+    mass_ug = (post - pre) * 1_000_000
+
+    unparsed = np.isnan(elapsed) | np.isnan(flow) | np.isnan(pre) | np.isnan(post)
+    status = np.select(
+        [
+            unparsed,
+            elapsed < MIN_ELAPSED_MIN,
+            flow <= MIN_FLOW_LPM,
+            post < pre,
+            volume_m3 == 0,
+        ],
+        QA_STATUSES[1:],
+        default=QA_OK,
+    )
+
+    ok = status == QA_OK
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pm25 = np.where(ok, mass_ug / volume_m3, np.nan)
+
+    result = df.copy()
+    result[VOLUME_COL] = volume_m3
+    result[PM25_COL] = pm25
+    result[QA_STATUS_COL] = pd.Categorical(status, categories=QA_STATUSES)
+    return result
+
+
+def pm25_sheet_column(result: pd.DataFrame) -> pd.Series:
+    """Concentration where QA passed, else the status text (the saved sheet format)."""
+    return result[PM25_COL].astype(object).where(
+        result[QA_STATUS_COL] == QA_OK, result[QA_STATUS_COL].astype(str)
+    )
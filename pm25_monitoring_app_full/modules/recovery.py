@@ -1,5 +1,6 @@
 
-import streamlit_authenticator as stauth
+from .password_hasher import HasherBusy
+from .user_utils import HASHER_BUSY_MESSAGE, get_user_directory, hash_password, invalidate_user_table
 
 def reset_password(email, new_password, sheet):
     data = sheet.get_all_values()
@@ -8,15 +9,18 @@ def reset_password(email, new_password, sheet):
         if row[2] == email:
             if row[4].lower() == "admin":
                 return False, "❌ Admin users cannot reset password via this form."
-            hashed_pw = stauth.Hasher([new_password]).generate()[0]
+            try:
+                hashed_pw = hash_password(new_password).result()
+            except HasherBusy:
+                return False, HASHER_BUSY_MESSAGE
             data[i][3] = hashed_pw
             sheet.update(f"A{i+1}:E{i+1}", [data[i]])
+            invalidate_user_table(sheet)
             return True, "✅ Password reset successfully."
     return False, "❌ Email not found."
 
 def recover_username(email, sheet):
-    users = sheet.get_all_records()
-    for user in users:
-        if user["Email"] == email:
-            return True, f"✅ Your username is: {user['Username']} (Role: {user['Role']})"
+    user = get_user_directory(sheet)["by_email"].get(email)
+    if user is not None:
+        return True, f"✅ Your username is: {user['Username']} (Role: {user['Role']})"
     return False, "❌ Email not found."
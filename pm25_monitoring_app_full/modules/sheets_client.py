@@ -0,0 +1,211 @@
+import json
+import threading
+
+import gspread
+import streamlit as st
+from google.auth.transport.requests import AuthorizedSession
+from google.oauth2.service_account import Credentials
+from gspread.exceptions import WorksheetNotFound
+
+from constants import SPREADSHEET_ID
+from modules.fake_gspread import FakeSheetsAPI, FakeSpreadsheet
+from modules.sheets_scheduler import (
+    READS_PER_USER_PER_MINUTE,
+    REQUESTS_PER_PROJECT_PER_MINUTE,
+    WRITES_PER_USER_PER_MINUTE,
+    SheetsScheduler,
+)
+from modules.sheets_trace import SheetsTracer, describe_request, request_size
+
+SCOPES = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file",
+    "https://www.googleapis.com/auth/drive",
+]
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE"}
+
+
+# =========================================================
+# REQUEST SCHEDULING
+# =========================================================
+@st.cache_resource
+def get_scheduler():
+    # Quotas are per service account; split them between worker processes.
+    workers = max(1, int(st.secrets.get("SHEETS_WORKERS", 1)))
+    return SheetsScheduler(
+        reads_per_minute=READS_PER_USER_PER_MINUTE / workers,
+        writes_per_minute=WRITES_PER_USER_PER_MINUTE / workers,
+        project_per_minute=REQUESTS_PER_PROJECT_PER_MINUTE / workers,
+    )
+
+
+@st.cache_resource
+def get_tracer():
+    return SheetsTracer()
+
+
+class ScheduledSession(AuthorizedSession):
+    """AuthorizedSession whose every request is scheduled and traced."""
+
+    def request(self, method, url, *args, **kwargs):
+        method = method.upper()
+        send = super().request
+        label, sheets = describe_request(method, url, kwargs)
+        return get_tracer().traced(
+            label,
+            sheets,
+            lambda: get_scheduler().run(
+                lambda: send(method, url, *args, **kwargs),
+                kind="read" if method == "GET" else "write",
+                idempotent=method in IDEMPOTENT_METHODS,
+            ),
+            request_bytes=request_size(kwargs),
+        )
+
+
+# =========================================================
+# SHARED CONNECTION
+# =========================================================
+@st.cache_resource
+def get_credentials():
+    """Service-account credentials shared by the whole process.
+
+    google-auth keeps the access token on this object and only refreshes it
+    once it has expired, so every session reuses the same token.
+    """
+    creds_dict = json.loads(st.secrets["GOOGLE_CREDENTIALS"])
+    return Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
+
+
+@st.cache_resource
+def get_client():
+    creds = get_credentials()
+    # One keep-alive HTTP session for every Sheets call in this process.
+    session = ScheduledSession(creds)
+    return gspread.Client(auth=creds, session=session)
+
+
+@st.cache_resource
+def get_spreadsheet():
+    if st.secrets.get("FAKE_SHEETS", False):
+        return get_fake_spreadsheet()
+    return get_client().open_by_key(SPREADSHEET_ID)
+
+
+@st.cache_resource
+def get_fake_spreadsheet():
+    """In-memory spreadsheet for load tests, enabled with the FAKE_SHEETS secret.
+
+    FAKE_SHEETS_LATENCY / FAKE_SHEETS_JITTER set the per-call delay in
+    seconds, FAKE_SHEETS_READS_PER_MINUTE / FAKE_SHEETS_WRITES_PER_MINUTE the
+    quota (default: the real per-user quota), and FAKE_SHEETS_SEED an
+    optional JSON file of {title: rows} to start from. Calls go through the
+    same scheduler as real requests.
+    """
+    api = FakeSheetsAPI(
+        latency=float(st.secrets.get("FAKE_SHEETS_LATENCY", 0.2)),
+        jitter=float(st.secrets.get("FAKE_SHEETS_JITTER", 0.1)),
+        reads_per_minute=int(st.secrets.get("FAKE_SHEETS_READS_PER_MINUTE", READS_PER_USER_PER_MINUTE)),
+        writes_per_minute=int(st.secrets.get("FAKE_SHEETS_WRITES_PER_MINUTE", WRITES_PER_USER_PER_MINUTE)),
+        runner=lambda call, kind, method, sheet: get_tracer().traced(
+            method, sheet, lambda: get_scheduler().run(call, kind=kind, idempotent=kind == "read")
+        ),
+    )
+
+    tables = None
+    seed = st.secrets.get("FAKE_SHEETS_SEED")
+    if seed:
+        with open(seed) as f:
+            tables = json.load(f)
+    return FakeSpreadsheet(tables, api)
+
+
+# =========================================================
+# WORKSHEET METADATA CACHE
+# =========================================================
+@st.cache_resource
+def _worksheet_cache():
+    # {spreadsheet id: {title: Worksheet}} plus row/column counts and header
+    # rows keyed by (spreadsheet id, title).
+    return {"lock": threading.RLock(), "books": {}, "dims": {}, "headers": {}}
+
+
+def _book(spreadsheet, refresh=False):
+    cache = _worksheet_cache()
+    book = cache["books"].get(spreadsheet.id)
+    if book is None or refresh:
+        book = {}
+        for ws in spreadsheet.worksheets():
+            book[ws.title] = ws
+            cache["dims"][(spreadsheet.id, ws.title)] = (ws.row_count, ws.col_count)
+        cache["books"][spreadsheet.id] = book
+    return book
+
+
+def list_worksheets(spreadsheet):
+    with _worksheet_cache()["lock"]:
+        return list(_book(spreadsheet).values())
+
+
+def get_worksheet(spreadsheet, title):
+    """Cached ``spreadsheet.worksheet(title)``; raises WorksheetNotFound the same way."""
+    with _worksheet_cache()["lock"]:
+        book = _book(spreadsheet)
+        if title not in book:
+            # It may have been created by another process since we listed.
+            book = _book(spreadsheet, refresh=True)
+        if title not in book:
+            raise WorksheetNotFound(title)
+        return book[title]
+
+
+def add_worksheet(spreadsheet, title, rows, cols):
+    cache = _worksheet_cache()
+    with cache["lock"]:
+        ws = spreadsheet.add_worksheet(title=title, rows=rows, cols=cols)
+        _book(spreadsheet)[title] = ws
+        cache["dims"][(spreadsheet.id, title)] = (ws.row_count, ws.col_count)
+        cache["headers"].pop((spreadsheet.id, title), None)
+        return ws
+
+
+def sheet_dimensions(spreadsheet, title):
+    """(row_count, col_count) of the grid as of the last metadata fetch."""
+    cache = _worksheet_cache()
+    with cache["lock"]:
+        get_worksheet(spreadsheet, title)
+        if (spreadsheet.id, title) not in cache["dims"]:
+            _book(spreadsheet, refresh=True)
+        return cache["dims"][(spreadsheet.id, title)]
+
+
+def get_header(spreadsheet, title):
+    cache = _worksheet_cache()
+    key = (spreadsheet.id, title)
+    with cache["lock"]:
+        if key not in cache["headers"]:
+            cache["headers"][key] = get_worksheet(spreadsheet, title).row_values(1)
+        return list(cache["headers"][key])
+
+
+def set_header(spreadsheet, title, header):
+    """Record a header row our own code just wrote."""
+    with _worksheet_cache()["lock"]:
+        _worksheet_cache()["headers"][(spreadsheet.id, title)] = list(header)
+
+
+def invalidate_worksheet(spreadsheet, title=None):
+    """Forget cached metadata after a sheet was cleared, resized or removed.
+
+    Drops the header and dimensions of ``title`` (or of every sheet) and
+    forces the worksheet list to be fetched again on next use.
+    """
+    cache = _worksheet_cache()
+    with cache["lock"]:
+        cache["books"].pop(spreadsheet.id, None)
+        for store in (cache["dims"], cache["headers"]):
+            for key in list(store):
+                if key[0] == spreadsheet.id and title in (None, key[1]):
+                    del store[key]
@@ -0,0 +1,151 @@
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from gspread.exceptions import APIError
+
+# Priority lanes: lower runs first.
+INTERACTIVE = 0
+WRITE = 1
+BACKGROUND = 2
+
+# Google Sheets API quotas (requests per minute).
+READS_PER_USER_PER_MINUTE = 60
+WRITES_PER_USER_PER_MINUTE = 60
+REQUESTS_PER_PROJECT_PER_MINUTE = 300
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# A 5xx on an append may still have been applied, so non-idempotent
+# requests are only retried when the API says it did not process them.
+SAFE_RETRY_STATUSES = {429, 503}
+
+_lane = contextvars.ContextVar("sheets_lane", default=None)
+
+
+@contextmanager
+def sheets_lane(priority):
+    """Run the enclosed Sheets calls in the given priority lane."""
+    token = _lane.set(priority)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class SheetsScheduler:
+    """Rate limits, prioritises and retries Sheets API requests.
+
+    Reads and writes draw from their own per-user bucket and from a shared
+    per-project bucket. Waiting callers are served by lane, then FIFO.
+    Throttled and transient failures are retried with jittered exponential
+    backoff, honouring ``Retry-After`` when the API sends it.
+    """
+
+    def __init__(
+        self,
+        reads_per_minute=READS_PER_USER_PER_MINUTE,
+        writes_per_minute=WRITES_PER_USER_PER_MINUTE,
+        project_per_minute=REQUESTS_PER_PROJECT_PER_MINUTE,
+        burst=10,
+        max_retries=5,
+        base_delay=1.0,
+        max_delay=32.0,
+    ):
+        self.buckets = {
+            "read": TokenBucket(reads_per_minute, burst),
+            "write": TokenBucket(writes_per_minute, burst),
+        }
+        self.project_bucket = TokenBucket(project_per_minute, burst * 2)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._waiters = {"read": [], "write": []}
+        self._seq = itertools.count()
+
+    def _acquire(self, kind, priority):
+        entry = (priority, next(self._seq))
+        waiters = self._waiters[kind]
+        with self._cond:
+            heapq.heappush(waiters, entry)
+            try:
+                while True:
+                    if waiters[0] == entry:
+                        wait = max(self.buckets[kind].wait_time(), self.project_bucket.wait_time())
+                        if wait == 0:
+                            self.buckets[kind].take()
+                            self.project_bucket.take()
+                            return
+                        self._cond.wait(timeout=wait)
+                    else:
+                        self._cond.wait()
+            finally:
+                waiters.remove(entry)
+                heapq.heapify(waiters)
+                self._cond.notify_all()
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def run(self, call, kind="read", idempotent=True, priority=None):
+        """Execute ``call()`` under the limiter and retry policy.
+
+        ``call`` may return a ``requests.Response`` (checked by status code)
+        or raise ``gspread.exceptions.APIError``.
+        """
+        if priority is None:
+            priority = _lane.get()
+        if priority is None:
+            priority = INTERACTIVE if kind == "read" else WRITE
+        retryable = RETRY_STATUSES if idempotent else SAFE_RETRY_STATUSES
+
+        attempt = 0
+        while True:
+            self._acquire(kind, priority)
+            try:
+                result = call()
+            except APIError as e:
+                status = getattr(e.response, "status_code", None)
+                if status not in retryable or attempt >= self.max_retries:
+                    raise
+                retry_after = e.response.headers.get("Retry-After")
+            else:
+                status = getattr(result, "status_code", None)
+                if status not in retryable or attempt >= self.max_retries:
+                    return result
+                retry_after = result.headers.get("Retry-After")
+
+            time.sleep(self._backoff(attempt, retry_after))
+            attempt += 1
@@ -0,0 +1,229 @@
+import contextvars
+import json
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from urllib.parse import unquote, urlsplit
+
+import numpy as np
+
+BACKGROUND_PAGE = "(background)"
+STARTUP_PAGE = "(before page routing)"
+
+_ACTION = re.compile(r":(append|clear)$")
+
+_current = contextvars.ContextVar("sheets_trace", default=None)
+
+
+class RerunTrace:
+    def __init__(self, page):
+        self.page = page
+        self.started = time.time()
+        self.calls = []
+        self.finished = False
+
+
+class SheetsTracer:
+    """Process-wide record of Sheets calls, grouped per rerun and per page.
+
+    Keeps the last ``max_calls`` calls and ``max_reruns`` rerun summaries
+    per page, which is enough for stable p50/p95 figures.
+    """
+
+    def __init__(self, max_calls=5000, max_reruns=500):
+        self.max_reruns = max_reruns
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=max_calls)
+        self._reruns = defaultdict(lambda: deque(maxlen=self.max_reruns))
+
+    def begin(self, page=STARTUP_PAGE):
+        # A rerun that ended outside ``finishing`` (an uncaught error) never
+        # reached finish(), so the previous trace in this script thread is
+        # closed here.
+        previous = _current.get()
+        if previous is not None and not previous.finished:
+            self.finish(previous)
+        trace = RerunTrace(page)
+        _current.set(trace)
+        return trace
+
+    @contextmanager
+    def finishing(self, trace):
+        """Finish ``trace`` if the block ends the rerun early.
+
+        ``st.stop()`` and ``st.rerun()`` raise, so the script's own
+        ``finish`` call at the end is never reached.
+        """
+        try:
+            yield
+        except BaseException:
+            self.finish(trace)
+            raise
+
+    def finish(self, trace):
+        if trace.finished:
+            return
+        trace.finished = True
+        with self._lock:
+            self._reruns[trace.page].append({
+                "started": trace.started,
+                "calls": len(trace.calls),
+                "sheets_seconds": sum(call["latency"] for call in trace.calls),
+                "bytes": sum(call["request_bytes"] + call["response_bytes"] for call in trace.calls),
+            })
+
+    def record(self, method, sheet, latency, request_bytes=0, response_bytes=0, status=None):
+        trace = _current.get()
+        page = trace.page if trace is not None and not trace.finished else BACKGROUND_PAGE
+        call = {
+            "time": time.time(),
+            "page": page,
+            "method": method,
+            "sheet": sheet,
+            "latency": latency,
+            "request_bytes": request_bytes,
+            "response_bytes": response_bytes,
+            "status": status,
+        }
+        if trace is not None and not trace.finished:
+            trace.calls.append(call)
+        with self._lock:
+            self._calls.append(call)
+
+    def traced(self, method, sheet, call, request_bytes=0):
+        """Run ``call()`` and record it; the response size comes from its result."""
+        started = time.perf_counter()
+        status = None
+        result = None
+        try:
+            result = call()
+            status = getattr(result, "status_code", 200)
+            return result
+        except Exception as e:
+            status = getattr(getattr(e, "response", None), "status_code", "error")
+            raise
+        finally:
+            self.record(
+                method, sheet, time.perf_counter() - started,
+                request_bytes=request_bytes,
+                response_bytes=payload_size(result),
+                status=status,
+            )
+
+    def calls(self):
+        with self._lock:
+            return list(self._calls)
+
+    def reruns(self):
+        with self._lock:
+            return {page: list(runs) for page, runs in self._reruns.items()}
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+            self._reruns.clear()
+
+    def page_summary(self):
+        """One row per page: reruns, calls per rerun and p50/p95 latencies."""
+        calls_by_page = defaultdict(list)
+        for call in self.calls():
+            calls_by_page[call["page"]].append(call["latency"])
+
+        reruns = self.reruns()
+        rows = []
+        for page in sorted(set(calls_by_page) | set(reruns)):
+            runs = reruns.get(page, [])
+            latencies = np.array(calls_by_page.get(page, []))
+            per_rerun = np.array([run["calls"] for run in runs])
+            sheets_time = np.array([run["sheets_seconds"] for run in runs])
+            rows.append({
+                "Page": page,
+                "Reruns": len(runs),
+                "Calls / rerun (avg)": round(per_rerun.mean(), 1) if len(runs) else None,
+                "Calls / rerun (max)": int(per_rerun.max()) if len(runs) else None,
+                "Call p50 (ms)": _ms(latencies, 50),
+                "Call p95 (ms)": _ms(latencies, 95),
+                "Sheets time / rerun p50 (ms)": _ms(sheets_time, 50),
+                "Sheets time / rerun p95 (ms)": _ms(sheets_time, 95),
+                "KB / rerun (avg)": round(np.mean([run["bytes"] for run in runs]) / 1024, 1) if runs else None,
+            })
+        return sorted(rows, key=lambda row: row["Sheets time / rerun p95 (ms)"] or 0, reverse=True)
+
+    def method_summary(self):
+        """Calls grouped by (page, method, sheet) with count, bytes and p50/p95."""
+        groups = defaultdict(list)
+        for call in self.calls():
+            groups[(call["page"], call["method"], call["sheet"])].append(call)
+
+        rows = []
+        for (page, method, sheet), calls in groups.items():
+            latencies = np.array([call["latency"] for call in calls])
+            rows.append({
+                "Page": page,
+                "Method": method,
+                "Sheet": sheet,
+                "Calls": len(calls),
+                "p50 (ms)": _ms(latencies, 50),
+                "p95 (ms)": _ms(latencies, 95),
+                "KB (total)": round(sum(c["request_bytes"] + c["response_bytes"] for c in calls) / 1024, 1),
+                "Errors": sum(1 for c in calls if c["status"] not in (200, None)),
+            })
+        return sorted(rows, key=lambda row: row["Calls"], reverse=True)
+
+
+def _ms(values, percentile):
+    if len(values) == 0:
+        return None
+    return round(float(np.percentile(values, percentile)) * 1000, 1)
+
+
+def payload_size(value):
+    """Approximate size in bytes of a response or of gspread-style row data."""
+    if value is None:
+        return 0
+    content = getattr(value, "content", None)
+    if isinstance(content, bytes):
+        return len(content)
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, list):
+        return sum(payload_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(payload_size(item) for item in value.values())
+    return len(str(value))
+
+
+def request_size(kwargs):
+    if kwargs.get("json") is not None:
+        return len(json.dumps(kwargs["json"], default=str))
+    data = kwargs.get("data")
+    return len(data) if isinstance(data, (bytes, str)) else 0
+
+
+def describe_request(method, url, kwargs):
+    """("GET values", "Observations")-style labels for a Sheets REST call."""
+    path = unquote(urlsplit(url).path)
+    tail = path.split("/spreadsheets/", 1)[-1]
+    spreadsheet_part, _, rest = tail.partition("/")
+
+    sheets = []
+    if rest.startswith("values/"):
+        a1_range = rest[len("values/"):]
+        match = _ACTION.search(a1_range)
+        endpoint = "values" + (match.group(0) if match else "")
+        sheets.append(_ACTION.sub("", a1_range))
+    elif rest:
+        endpoint = rest
+        params = kwargs.get("params") or {}
+        body = kwargs.get("json") or {}
+        sheets.extend(params.get("ranges", []) if isinstance(params, dict) else [])
+        sheets.extend(item.get("range", "") for item in body.get("data", []) if isinstance(item, dict))
+    elif ":" in spreadsheet_part:
+        endpoint = ":" + spreadsheet_part.split(":", 1)[1]
+    else:
+        endpoint = "metadata"
+
+    titles = sorted({s.split("!")[0].strip("'") for s in sheets if s})
+    return f"{method} {endpoint}", ", ".join(titles)
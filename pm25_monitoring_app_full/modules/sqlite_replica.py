@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ROW_COL = "_row"
+INDEXED_COLUMNS = ["Site", "Date", "Entry Type", "ID", "Submitted At"]
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _unique_columns(header):
+    seen = {}
+    columns = []
+    for i, col in enumerate(header):
+        col = str(col).strip() or f"Column {i + 1}"
+        if col in seen:
+            seen[col] += 1
+            col = f"{col}_{seen[col]}"
+        else:
+            seen[col] = 0
+        columns.append(col)
+    return columns
+
+
+class SheetReplica:
+    """Local SQLite copy of whole worksheets for indexed, offline reads.
+
+    Each worksheet becomes one table of TEXT columns plus ``_row`` (the
+    sheet row number). ``load`` swaps a table's contents in one transaction,
+    so readers see either the old or the new copy, never a mix.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self._digests = {}
+        self.synced_at = {}
+        self._wake = threading.Event()
+        self._thread = None
+        self.interval = None
+
+    def load(self, title, values):
+        """Replace the table for ``title`` with the sheet ``values``. Returns False if unchanged."""
+        digest = hashlib.sha1(json.dumps(values, ensure_ascii=False).encode()).hexdigest()
+        with self._lock:
+            self.synced_at[title] = time.monotonic()
+            if self._digests.get(title) == digest:
+                return False
+
+            columns = _unique_columns(values[0]) if values else []
+            width = len(columns)
+            rows = [
+                [row_number] + (list(row[:width]) + [""] * (width - len(row)))
+                for row_number, row in enumerate(values[1:], start=2)
+            ]
+
+            table, staging = _quote(title), _quote(f"{title}__staging")
+            conn = self._conn
+            conn.execute("BEGIN")
+            try:
+                conn.execute(f"DROP TABLE IF EXISTS {staging}")
+                conn.execute(
+                    f"CREATE TABLE {staging} ({_quote(ROW_COL)} INTEGER PRIMARY KEY"
+                    + "".join(f", {_quote(col)} TEXT" for col in columns)
+                    + ")"
+                )
+                if rows:
+                    placeholders = ", ".join("?" * (width + 1))
+                    conn.executemany(f"INSERT INTO {staging} VALUES ({placeholders})", rows)
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+                for col in INDEXED_COLUMNS:
+                    if col in columns:
+                        conn.execute(f"CREATE INDEX {_quote(f'idx {title} {col}')} ON {table} ({_quote(col)})")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            self._digests[title] = digest
+            return True
+
+    def has(self, title, max_age=None):
+        """True when ``title`` was synced, and within ``max_age`` seconds if given."""
+        with self._lock:
+            synced = self.synced_at.get(title)
+        if synced is None:
+            return False
+        return max_age is None or time.monotonic() - synced <= max_age
+
+    def query(self, title, equals=None, ranges=None):
+        """Rows of ``title`` as a DataFrame indexed like ``load_data_from_sheet``.
+
+        ``equals`` maps column -> value; ``ranges`` maps column -> (low, high)
+        with ``low <= value < high``, either bound optional. Filters on
+        columns the table does not have are ignored.
+        """
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT * FROM {_quote(title)} LIMIT 0")
+            columns = [d[0] for d in cursor.description]
+
+            clauses, params = [], []
+            for col, value in (equals or {}).items():
+                if col in columns:
+                    clauses.append(f"{_quote(col)} = ?")
+                    params.append(value)
+            for col, (low, high) in (ranges or {}).items():
+                if col not in columns:
+                    continue
+                if low is not None:
+                    clauses.append(f"{_quote(col)} >= ?")
+                    params.append(low)
+                if high is not None:
+                    clauses.append(f"{_quote(col)} < ?")
+                    params.append(high)
+
+            sql = f"SELECT * FROM {_quote(title)}"
+            if clauses:
+                sql += " WHERE " + " AND ".join(clauses)
+            sql += f" ORDER BY {_quote(ROW_COL)}"
+            rows = self._conn.execute(sql, params).fetchall()
+
+        df = pd.DataFrame(rows, columns=columns)
+        df.index = df.pop(ROW_COL) - 2
+        df.index.name = None
+        return df
+
+    def request_sync(self):
+        """Wake the sync loop now instead of at the next interval."""
+        self._wake.set()
+
+    def start(self, fetch, interval):
+        """Run ``fetch()`` -> {title: values} every ``interval`` seconds in a daemon thread."""
+        if self._thread is not None:
+            return
+        self.interval = interval
+
+        def loop():
+            while True:
+                try:
+                    for title, values in fetch().items():
+                        self.load(title, values)
+                except Exception:
+                    logger.warning("Replica sync failed, will retry in %.0fs", interval, exc_info=True)
+                self._wake.wait(timeout=interval)
+                self._wake.clear()
+
+        self._thread = threading.Thread(target=loop, name="sheet-replica-sync", daemon=True)
+        self._thread.start()
@@ -0,0 +1,76 @@
+import importlib
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_logged = False
+
+
+def _network_seconds(trace, first_call=0):
+    return sum(call["latency"] for call in trace.calls[first_call:])
+
+
+class StartupProfile:
+    """Splits one rerun's wall time into imports, Sheets network time and the rest.
+
+    ``trace`` is the rerun's ``RerunTrace``; its recorded Sheets calls are
+    the network time. Sheets calls made while a module was being imported
+    count as network time, not import time, so a module that still touches
+    Sheets at import shows up as such.
+    """
+
+    def __init__(self, trace, started=None):
+        self.trace = trace
+        self.started = time.perf_counter() if started is None else started
+        self.imports = {}  # name: (seconds without network, network seconds)
+
+    def record_import(self, name, seconds, network_seconds=0.0):
+        self.imports[name] = (max(0.0, seconds - network_seconds), network_seconds)
+
+    @contextmanager
+    def importing(self, name):
+        first_call = len(self.trace.calls)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            network = _network_seconds(self.trace, first_call)
+            self.record_import(name, time.perf_counter() - t0, network)
+
+    def import_module(self, name):
+        """``importlib.import_module(name)``, timed. Cached modules cost ~0."""
+        with self.importing(name):
+            return importlib.import_module(name)
+
+    def report(self):
+        total = time.perf_counter() - self.started
+        imports = sum(seconds for seconds, _ in self.imports.values())
+        network = _network_seconds(self.trace)
+        return {
+            "total_seconds": round(total, 3),
+            "import_seconds": round(imports, 3),
+            "network_seconds": round(network, 3),
+            "network_calls": len(self.trace.calls),
+            "other_seconds": round(max(0.0, total - imports - network), 3),
+            "imports": {name: round(seconds, 3) for name, (seconds, _) in self.imports.items()},
+        }
+
+    def summary_line(self):
+        report = self.report()
+        slowest = sorted(report["imports"].items(), key=lambda item: item[1], reverse=True)[:3]
+        return (
+            f"[startup] page={self.trace.page} total={report['total_seconds']}s "
+            f"imports={report['import_seconds']}s network={report['network_seconds']}s "
+            f"({report['network_calls']} Sheets calls) other={report['other_seconds']}s "
+            f"slowest imports: {', '.join(f'{name}={s}s' for name, s in slowest) or '-'}"
+        )
+
+
+def log_once(profile):
+    """Log ``profile``'s summary line for the first rerun in this process."""
+    global _logged
+    if not _logged:
+        _logged = True
+        logger.info(profile.summary_line())
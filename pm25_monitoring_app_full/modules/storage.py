@@ -0,0 +1,444 @@
+import json
+import logging
+import sqlite3
+import threading
+from typing import List, Protocol
+
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_to_rowcol
+
+from modules.sheets_client import (
+    add_worksheet,
+    get_header,
+    get_worksheet,
+    invalidate_worksheet,
+    list_worksheets,
+    set_header,
+    sheet_dimensions,
+)
+from modules.sheets_scheduler import BACKGROUND, sheets_lane
+
+logger = logging.getLogger(__name__)
+
+Rows = List[List[str]]
+
+STAGING_SUFFIX = " (staging)"
+RETIRED_SUFFIX = " (old "
+
+
+def staging_table(name):
+    """Name of the table a full rewrite of ``name`` is written to before the swap."""
+    return f"{name}{STAGING_SUFFIX}"
+
+
+class StorageBackend(Protocol):
+    """Table storage used by ``resource.py``.
+
+    A table is a list of rows of cell strings; row 1 is the header. Row
+    numbers are 1-based and ranges are A1 notation, as in Google Sheets.
+    """
+
+    def list_tables(self) -> List[str]: ...
+
+    def read_table(self, name: str) -> Rows:
+        """All rows, padded to the same width."""
+        ...
+
+    def read_header(self, name: str) -> List[str]: ...
+
+    def append_rows(self, name: str, rows: Rows) -> None: ...
+
+    def update_range(self, name: str, a1_range: str, values: Rows) -> None: ...
+
+    def delete_rows(self, name: str, row_numbers: List[int]) -> None: ...
+
+    def write_table(self, name: str, values: Rows) -> None:
+        """Replace the whole table, creating it if needed."""
+        ...
+
+    def swap_table(self, staging: str, name: str) -> None:
+        """Make ``staging`` the table ``name`` in one step; ``staging`` is gone afterwards."""
+        ...
+
+
+def _start_cell(a1_range):
+    return a1_to_rowcol(a1_range.split(":")[0].split("!")[-1])
+
+
+def _cell(value):
+    return "" if value is None else str(value)
+
+
+def _rectangular(rows):
+    # Pad like gspread's get_all_values, so every row has the same width.
+    width = max((len(row) for row in rows), default=0)
+    return [list(row) + [""] * (width - len(row)) for row in rows]
+
+
+def _apply_update(rows, a1_range, values):
+    # In-place write of a block of values into a ragged list of rows.
+    first_row, first_col = _start_cell(a1_range)
+    for i, new in enumerate(values):
+        while len(rows) < first_row + i:
+            rows.append([])
+        row = rows[first_row + i - 1]
+        if len(row) < first_col - 1 + len(new):
+            row.extend([""] * (first_col - 1 + len(new) - len(row)))
+        row[first_col - 1:first_col - 1 + len(new)] = [_cell(v) for v in new]
+
+
+# =========================================================
+# GOOGLE SHEETS
+# =========================================================
+def stale_metadata(error):
+    """True when the API rejected a sheet id or title that no longer exists."""
+    if not isinstance(error, APIError) or getattr(error.response, "status_code", None) != 400:
+        return False
+    message = str(error)
+    return "No grid with id" in message or "Unable to parse range" in message
+
+
+class SheetsBackend:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def _fresh_metadata(self, work):
+        # Another process's swap_table gives the live table a new sheet id
+        # and deletes the old sheet; our cached Worksheets only find out
+        # when the API rejects them. Refetch the sheet list and retry once.
+        # Every wrapped request is a single batchUpdate or is safe to
+        # repeat, so a rejected attempt changed nothing.
+        try:
+            return work()
+        except APIError as e:
+            if not stale_metadata(e):
+                raise
+            invalidate_worksheet(self.spreadsheet)
+            return work()
+
+    def list_tables(self):
+        return [ws.title for ws in list_worksheets(self.spreadsheet)]
+
+    def read_table(self, name):
+        return get_worksheet(self.spreadsheet, name).get_all_values()
+
+    def read_header(self, name):
+        return get_header(self.spreadsheet, name)
+
+    def append_rows(self, name, rows):
+        get_worksheet(self.spreadsheet, name).append_rows(rows)
+
+    def _ensure_grid(self, ws, last_row, last_col):
+        # Writes past the grid are rejected. The cached row count can only
+        # lag behind (appends grow the grid), so at worst a few spare rows
+        # get added. Rows grow with 25% headroom so a table written in
+        # chunks doesn't need a resize before every chunk.
+        row_count, col_count = sheet_dimensions(self.spreadsheet, ws.title)
+        if last_row <= row_count and last_col <= col_count:
+            return
+        if last_row > row_count:
+            ws.add_rows(last_row - row_count + last_row // 4)
+        if last_col > col_count:
+            ws.add_cols(last_col - col_count)
+        invalidate_worksheet(self.spreadsheet, ws.title)
+
+    def update_range(self, name, a1_range, values):
+        first_row, first_col = _start_cell(a1_range)
+
+        def work():
+            ws = get_worksheet(self.spreadsheet, name)
+            self._ensure_grid(
+                ws,
+                first_row + len(values) - 1,
+                first_col + max((len(row) for row in values), default=1) - 1,
+            )
+            ws.update(range_name=a1_range, values=values)
+        self._fresh_metadata(work)
+        if first_row == 1:
+            header = self.read_header(name)
+            _apply_update([header], a1_range, values[:1])
+            set_header(self.spreadsheet, name, header)
+
+    def delete_rows(self, name, row_numbers):
+        def work():
+            ws = get_worksheet(self.spreadsheet, name)
+            # One batchUpdate, bottom-up so the numbers stay valid.
+            self.spreadsheet.batch_update({"requests": [
+                {"deleteDimension": {"range": {
+                    "sheetId": ws.id,
+                    "dimension": "ROWS",
+                    "startIndex": row - 1,
+                    "endIndex": row,
+                }}}
+                for row in sorted(set(row_numbers), reverse=True)
+            ]})
+        self._fresh_metadata(work)
+        invalidate_worksheet(self.spreadsheet, name)
+
+    def write_table(self, name, values):
+        def work():
+            try:
+                ws = get_worksheet(self.spreadsheet, name)
+                ws.clear()
+            except WorksheetNotFound:
+                width = max((len(row) for row in values), default=1)
+                ws = add_worksheet(
+                    self.spreadsheet,
+                    title=name,
+                    rows=str(max(len(values) + 10, 1000)),
+                    cols=str(max(width + 5, 50)),
+                )
+                if name.endswith(STAGING_SUFFIX):
+                    self.spreadsheet.batch_update({"requests": [
+                        _sheet_properties(ws.id, hidden=True),
+                    ]})
+
+            self._ensure_grid(ws, len(values), max((len(row) for row in values), default=1))
+            ws.update(range_name="A1", values=values)
+        self._fresh_metadata(work)
+        set_header(self.spreadsheet, name, values[0] if values else [])
+
+    def swap_table(self, staging, name):
+        header = self.read_header(staging)
+
+        def work():
+            new = get_worksheet(self.spreadsheet, staging)
+            try:
+                live = get_worksheet(self.spreadsheet, name)
+            except WorksheetNotFound:
+                live = None
+
+            # Both renames go in one batchUpdate, which the API applies
+            # atomically: readers see the old sheet or the new one, never
+            # neither. The old copy is hidden and deleted afterwards.
+            requests = []
+            if live is not None:
+                retired = f"{name}{RETIRED_SUFFIX}{live.id})"
+                requests.append(_sheet_properties(live.id, title=retired, hidden=True))
+            requests.append(_sheet_properties(
+                new.id, title=name, hidden=False, index=getattr(live, "index", None),
+            ))
+            self.spreadsheet.batch_update({"requests": requests})
+        self._fresh_metadata(work)
+
+        invalidate_worksheet(self.spreadsheet, staging)
+        invalidate_worksheet(self.spreadsheet, name)
+        set_header(self.spreadsheet, name, header)
+        threading.Thread(
+            target=self._delete_retired, args=(name,), name="retired-sheet-cleanup", daemon=True,
+        ).start()
+
+    def _delete_retired(self, name):
+        # Also sweeps copies left behind by earlier cleanups that failed.
+        try:
+            with sheets_lane(BACKGROUND):
+                for ws in list_worksheets(self.spreadsheet):
+                    if ws.title.startswith(f"{name}{RETIRED_SUFFIX}"):
+                        self.spreadsheet.del_worksheet(ws)
+                        invalidate_worksheet(self.spreadsheet, ws.title)
+        except Exception:
+            logger.warning(
+                "Could not delete retired copies of %s, will retry after the next swap", name, exc_info=True
+            )
+
+
+def _sheet_properties(sheet_id, **properties):
+    properties = {key: value for key, value in properties.items() if value is not None}
+    return {"updateSheetProperties": {
+        "properties": {"sheetId": sheet_id, **properties},
+        "fields": ",".join(properties),
+    }}
+
+
+# =========================================================
+# LOCAL TABLE HANDLE
+# =========================================================
+class TableRef:
+    """Stands in for a worksheet when the table lives in a local backend.
+
+    Has the ``title`` and ``id`` that ``resource.py`` reads from worksheets;
+    every read and write goes through the backend by that title.
+    """
+
+    def __init__(self, title):
+        self.title = title
+        self.id = title
+
+
+# =========================================================
+# IN-MEMORY
+# =========================================================
+class MemoryBackend:
+    """Process-local tables; for offline runs and load tests."""
+
+    def __init__(self, tables=None):
+        self._lock = threading.Lock()
+        self._tables = {
+            name: [[_cell(v) for v in row] for row in rows]
+            for name, rows in (tables or {}).items()
+        }
+
+    def _table(self, name):
+        if name not in self._tables:
+            raise WorksheetNotFound(name)
+        return self._tables[name]
+
+    def list_tables(self):
+        with self._lock:
+            return list(self._tables)
+
+    def read_table(self, name):
+        with self._lock:
+            return _rectangular(self._table(name))
+
+    def read_header(self, name):
+        with self._lock:
+            rows = self._table(name)
+            return list(rows[0]) if rows else []
+
+    def append_rows(self, name, rows):
+        with self._lock:
+            self._table(name).extend([_cell(v) for v in row] for row in rows)
+
+    def update_range(self, name, a1_range, values):
+        with self._lock:
+            _apply_update(self._table(name), a1_range, values)
+
+    def delete_rows(self, name, row_numbers):
+        with self._lock:
+            rows = self._table(name)
+            for row in sorted(set(row_numbers), reverse=True):
+                del rows[row - 1]
+
+    def write_table(self, name, values):
+        with self._lock:
+            self._tables[name] = [[_cell(v) for v in row] for row in values]
+
+    def swap_table(self, staging, name):
+        with self._lock:
+            self._table(staging)
+            self._tables[name] = self._tables.pop(staging)
+
+
+# =========================================================
+# SQLITE
+# =========================================================
+class SQLiteBackend:
+    """Tables in one SQLite file, one JSON-encoded row per record.
+
+    Row numbers are positions in ``seq`` order, so deleting a row shifts
+    the ones below it exactly like a sheet does.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS tables (name TEXT PRIMARY KEY)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows "
+            "(tbl TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (tbl, seq))"
+        )
+        self._lock = threading.Lock()
+
+    def _check(self, name):
+        if not self._conn.execute("SELECT 1 FROM tables WHERE name = ?", (name,)).fetchone():
+            raise WorksheetNotFound(name)
+
+    def _seqs(self, name):
+        return [seq for seq, in self._conn.execute(
+            "SELECT seq FROM rows WHERE tbl = ? ORDER BY seq", (name,)
+        )]
+
+    def _transaction(self, work):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work()
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def list_tables(self):
+        with self._lock:
+            return [name for name, in self._conn.execute("SELECT name FROM tables ORDER BY rowid")]
+
+    def read_table(self, name):
+        with self._lock:
+            self._check(name)
+            return _rectangular([json.loads(data) for data, in self._conn.execute(
+                "SELECT data FROM rows WHERE tbl = ? ORDER BY seq", (name,)
+            )])
+
+    def read_header(self, name):
+        with self._lock:
+            self._check(name)
+            row = self._conn.execute(
+                "SELECT data FROM rows WHERE tbl = ? ORDER BY seq LIMIT 1", (name,)
+            ).fetchone()
+            return json.loads(row[0]) if row else []
+
+    def _append(self, name, rows):
+        start = self._conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) + 1 FROM rows WHERE tbl = ?", (name,)
+        ).fetchone()[0]
+        self._conn.executemany(
+            "INSERT INTO rows (tbl, seq, data) VALUES (?, ?, ?)",
+            [(name, start + i, json.dumps([_cell(v) for v in row])) for i, row in enumerate(rows)],
+        )
+
+    def append_rows(self, name, rows):
+        def work():
+            self._check(name)
+            self._append(name, rows)
+        self._transaction(work)
+
+    def update_range(self, name, a1_range, values):
+        def work():
+            self._check(name)
+            first_row, _ = _start_cell(a1_range)
+            seqs = self._seqs(name)
+            existing = [json.loads(data) for data, in self._conn.execute(
+                "SELECT data FROM rows WHERE tbl = ? ORDER BY seq LIMIT ? OFFSET ?",
+                (name, len(values), first_row - 1),
+            )]
+            block = [[] for _ in range(first_row - 1)] + existing
+            _apply_update(block, a1_range, values)
+            block = block[first_row - 1:]
+            overlap = seqs[first_row - 1:first_row - 1 + len(block)]
+            self._conn.executemany(
+                "UPDATE rows SET data = ? WHERE tbl = ? AND seq = ?",
+                [(json.dumps(row), name, seq) for row, seq in zip(block, overlap)],
+            )
+            # Writes below the last row extend the table, as in a sheet.
+            gap = max(0, first_row - 1 - len(seqs))
+            if len(block) > len(overlap):
+                self._append(name, [[]] * gap + block[len(overlap):])
+        self._transaction(work)
+
+    def delete_rows(self, name, row_numbers):
+        def work():
+            self._check(name)
+            seqs = self._seqs(name)
+            self._conn.executemany(
+                "DELETE FROM rows WHERE tbl = ? AND seq = ?",
+                [(name, seqs[row - 1]) for row in set(row_numbers) if row <= len(seqs)],
+            )
+        self._transaction(work)
+
+    def write_table(self, name, values):
+        def work():
+            self._conn.execute("INSERT OR IGNORE INTO tables (name) VALUES (?)", (name,))
+            self._conn.execute("DELETE FROM rows WHERE tbl = ?", (name,))
+            self._append(name, values)
+        self._transaction(work)
+
+    def swap_table(self, staging, name):
+        def work():
+            self._check(staging)
+            self._conn.execute("INSERT OR IGNORE INTO tables (name) VALUES (?)", (name,))
+            self._conn.execute("DELETE FROM rows WHERE tbl = ?", (name,))
+            self._conn.execute("UPDATE rows SET tbl = ? WHERE tbl = ?", (name, staging))
+            self._conn.execute("DELETE FROM tables WHERE name = ?", (staging,))
+        self._transaction(work)
@@ -1,7 +1,8 @@
 
 import streamlit as st
 from contextlib import contextmanager
-from .user_utils import register_user_request,spreadsheet
+from .sheets_client import get_spreadsheet
+from .user_utils import register_user_request
 from .recovery import reset_password, recover_username
 from constants import REG_REQUESTS_SHEET, LOG_SHEET
 
@@ -26,7 +27,8 @@ def show_registration_form(sheet):
                 st.error("❌ All fields must be filled in.")
             else:
                 # Register user and move the data to the registration request sheet
-                success, message = register_user_request(username, name, email, password, role,spreadsheet)
+                with st.spinner("Submitting registration..."):
+                    success, message = register_user_request(username, name, email, password, role, get_spreadsheet())
                 if success:
                     st.success(message)
                 else:
@@ -39,7 +41,8 @@ def display_password_reset_form(sheet):
     email = st.text_input("Enter your email")
     new_password = st.text_input("Enter new password", type="password")
     if st.button("Reset Password"):
-        success, message = reset_password(email, new_password, sheet)
+        with st.spinner("Resetting password..."):
+            success, message = reset_password(email, new_password, sheet)
         st.success(message) if success else st.error(message)
 
 def display_username_recovery_form(sheet):
@@ -1,70 +1,177 @@
+import threading
+import time
+
 import streamlit as st
 import gspread
-import json
-from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
-import streamlit_authenticator as stauth
 
 from gspread.exceptions import APIError
 from gspread.exceptions import WorksheetNotFound 
 
-from constants import SPREADSHEET_ID, USERS_SHEET, REG_REQUESTS_SHEET, LOG_SHEET
-
-# Google Sheets Setup
-creds_json = st.secrets["GOOGLE_CREDENTIALS"]
-creds_dict = json.loads(creds_json)
-scope = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive"
-]
-creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-client = gspread.authorize(creds)
-spreadsheet = client.open_by_key(SPREADSHEET_ID)
+from constants import USERS_SHEET, REG_REQUESTS_SHEET, LOG_SHEET
+from modules.sheets_client import (
+    add_worksheet,
+    get_spreadsheet,
+    get_worksheet,
+    invalidate_worksheet,
+)
+from modules.password_hasher import DEFAULT_ROUNDS, HasherBusy, PasswordHasher
 
 
-@st.cache_data(ttl=60)
-def get_users_sheet_data(sheet):
-    return sheet.get_all_records()
-
-@st.cache_data(ttl=60)
-def get_reg_requests_data(sheet):
-    return sheet.get_all_records()
+# Google Sheets Setup
+def __getattr__(name):
+    # ``from modules.user_utils import spreadsheet`` opens it on import of
+    # the caller, not of this module.
+    if name == "spreadsheet":
+        return get_spreadsheet()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Seconds a cached Users / Registration Requests / Log table is trusted
+# before the sheet is read again. Our own writes update it in place.
+USER_TABLES_TTL = 60
+
+
+# =========================================================
+# USER TABLE CACHE
+# =========================================================
+@st.cache_resource
+def _user_tables():
+    # Process-wide: {worksheet id: table}, shared by every session. A table
+    # is {"loaded_at", "header", "records", "directory"}; records are in
+    # sheet order, so record i sits on sheet row i + 2.
+    return {"lock": threading.RLock(), "by_sheet": {}}
+
+
+def _record(header, row):
+    row = list(row) + [""] * (len(header) - len(row))
+    return dict(zip(header, row))
+
+
+def _table(sheet):
+    # Caller holds the lock.
+    cache = _user_tables()
+    table = cache["by_sheet"].get(sheet.id)
+    if table is None or time.monotonic() - table["loaded_at"] > USER_TABLES_TTL:
+        values = sheet.get_all_values()
+        header = values[0] if values else []
+        table = {
+            "loaded_at": time.monotonic(),
+            "header": header,
+            "records": [_record(header, row) for row in values[1:]],
+            "directory": None,
+        }
+        cache["by_sheet"][sheet.id] = table
+    return table
+
+
+def get_table_records(sheet):
+    """Rows of ``sheet`` as {header: value} dicts, read at most once per TTL."""
+    with _user_tables()["lock"]:
+        return [dict(record) for record in _table(sheet)["records"]]
+
+
+def _append_cached(sheet, row):
+    """Write-through for a row our own code just appended to ``sheet``."""
+    cache = _user_tables()
+    with cache["lock"]:
+        table = cache["by_sheet"].get(sheet.id)
+        if table is not None:
+            table["records"].append(_record(table["header"], row))
+            table["directory"] = None
+
+
+def invalidate_user_table(sheet=None):
+    """Forget the cached table of ``sheet`` (or every cached table)."""
+    cache = _user_tables()
+    with cache["lock"]:
+        if sheet is None:
+            cache["by_sheet"].clear()
+        else:
+            cache["by_sheet"].pop(sheet.id, None)
+
+
+def _locate_record(sheet, column, value):
+    # Caller holds the lock. (table, position) of the first record whose
+    # ``column`` matches ``value`` (trimmed, any case), checked against the
+    # live row so a row moved by another process is never deleted by mistake.
+    wanted = value.strip().lower()
+    for _ in range(2):
+        table = _table(sheet)
+        if column not in table["header"]:
+            print(f"Error: '{column}' column not found in header")
+            return table, None
+        col = table["header"].index(column)
+        for i, record in enumerate(table["records"]):
+            if record[column].strip().lower() == wanted:
+                live = sheet.row_values(i + 2)
+                if len(live) > col and live[col].strip().lower() == wanted:
+                    return table, i
+                break
+        # Missing or moved: re-read the sheet once.
+        invalidate_user_table(sheet)
+    return table, None
+
+
+def delete_record(spreadsheet, sheet, column, value):
+    """Delete the first row of ``sheet`` whose ``column`` matches ``value``."""
+    with _user_tables()["lock"]:
+        table, i = _locate_record(sheet, column, value)
+        if i is None:
+            return False
+        sheet.delete_rows(i + 2)
+        invalidate_worksheet(spreadsheet, sheet.title)
+        del table["records"][i]
+        table["directory"] = None
+        return True
+
+
+@st.cache_resource
+def get_password_hasher():
+    # Process-wide pool; its size and the bcrypt cost come from secrets.
+    return PasswordHasher(
+        workers=int(st.secrets.get("PASSWORD_HASH_WORKERS", 2)),
+        rounds=int(st.secrets.get("BCRYPT_ROUNDS", DEFAULT_ROUNDS)),
+        max_pending=int(st.secrets.get("PASSWORD_HASH_MAX_PENDING", 32)),
+    )
 
-@st.cache_data(ttl=60)
-def get_reg_requests_values(sheet):
-    return sheet.get_all_values()
 
+HASHER_BUSY_MESSAGE = "⏳ Too many requests right now. Please try again in a moment."
 
 
 def hash_password(password):
-    return stauth.Hasher([password]).generate()[0]
+    """Future resolving to the bcrypt hash of ``password``.
+
+    Raises HasherBusy when the hashing queue is full. The callers here wait
+    on the result inside their spinner, so the pool caps how much CPU
+    concurrent hashing takes; it does not shorten the wait.
+    """
+    return get_password_hasher().hash(password)
 
 def ensure_users_sheet(spreadsheet):
     try:
-        return spreadsheet.worksheet(USERS_SHEET)
+        return get_worksheet(spreadsheet, USERS_SHEET)
     except gspread.exceptions.WorksheetNotFound:
-        sheet = spreadsheet.add_worksheet(USERS_SHEET, rows="100", cols="5")
+        sheet = add_worksheet(spreadsheet, USERS_SHEET, rows="100", cols="5")
         sheet.append_row(["Username", "Full Name", "Email", "Password", "Role"])
         return sheet
 
 
 def ensure_reg_requests_sheet(spreadsheet):
     try:
-        return spreadsheet.worksheet(REG_REQUESTS_SHEET)
+        return get_worksheet(spreadsheet, REG_REQUESTS_SHEET)
     except WorksheetNotFound:
         # Create the worksheet if it doesn't exist
-        sheet = spreadsheet.add_worksheet(title=REG_REQUESTS_SHEET, rows=100, cols=6)
+        sheet = add_worksheet(spreadsheet, title=REG_REQUESTS_SHEET, rows=100, cols=6)
         sheet.append_row(["Timestamp", "Username", "Full Name", "Email","Password", "Role", "Status"])  # header
         return sheet
 
 
 def ensure_log_sheet(spreadsheet):
     try:
-        return spreadsheet.worksheet(LOG_SHEET)
+        return get_worksheet(spreadsheet, LOG_SHEET)
     except gspread.exceptions.WorksheetNotFound:
-        sheet = spreadsheet.add_worksheet(LOG_SHEET, rows="100", cols="5")
+        sheet = add_worksheet(spreadsheet, LOG_SHEET, rows="100", cols="5")
         sheet.append_row(["Username", "Action", "By", "Timestamp"])
         return sheet
 
@@ -73,7 +180,7 @@ def ensure_log_sheet(spreadsheet):
 
 def register_user_request(username, name, email, password, role, spreadsheet):
     sheet = ensure_reg_requests_sheet(spreadsheet)
-    requests = sheet.get_all_records()
+    requests = get_table_records(sheet)
 
     for user in requests:
         if user["Username"].lower() == username.lower():
@@ -81,50 +188,43 @@ def register_user_request(username, name, email, password, role, spreadsheet):
         if user["Email"].lower() == email.lower():
             return False, "Email already requested."
 
-    # Hash the password before saving it to the sheet
-    password_hash = hash_password(password)
-    
-    # Print the password hash to the console for debugging
-    print("Generated Password Hash:", password_hash)
+    # Hash the password before saving it to the sheet; only requests that
+    # will be saved take a slot on the hasher pool.
+    try:
+        password_hash = hash_password(password).result()
+    except HasherBusy:
+        return False, HASHER_BUSY_MESSAGE
 
     # Append the registration request with hashed password
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    sheet.append_row([timestamp, username, name, email, password_hash, role, "pending"])
+    row = [timestamp, username, name, email, password_hash, role, "pending"]
+    sheet.append_row(row)
+    _append_cached(sheet, row)
 
     return True, "✅ Registration request submitted."
 
 
 def register_user_to_sheet(username, name, email, password, role, sheet, is_hashed=False):
-    users = sheet.get_all_records()
-    for user in users:
-        if user["Username"] == username:
-            return False, "Username already exists."
-        if user["Email"] == email:
-            return False, "Email already registered."
-
-    final_pw = password if is_hashed else stauth.Hasher([password]).generate()[0]
-    sheet.append_row([username, name, email, final_pw, role])
+    directory = get_user_directory(sheet)
+    if username in directory["by_username"]:
+        return False, "Username already exists."
+    if email in directory["by_email"]:
+        return False, "Email already registered."
+
+    try:
+        final_pw = password if is_hashed else hash_password(password).result()
+    except HasherBusy:
+        return False, HASHER_BUSY_MESSAGE
+    row = [username, name, email, final_pw, role]
+    sheet.append_row(row)
+    _append_cached(sheet, row)
     return True, "User approved and added."
 
 def delete_registration_request(username, spreadsheet):
     sheet = ensure_reg_requests_sheet(spreadsheet)
-    data = sheet.get_all_values()
-
-    # Find the index of the "Username" column in the header row (first row)
-    header = data[0]
-    try:
-        username_col_index = header.index("Username")
-    except ValueError:
-        print("Error: 'Username' column not found in header")
-        return False
-
-    for i, row in enumerate(data[1:], start=2):  # start=2 for 1-based sheet rows skipping header
-        print(f"Checking row {i}: {row}")
-        # Check with case-insensitive comparison and strip whitespace
-        if row[username_col_index].strip().lower() == username.strip().lower():
-            print(f"Deleting row {i} for username '{username}'")
-            sheet.delete_rows(i)
-            return True
+    if delete_record(spreadsheet, sheet, "Username", username):
+        print(f"Deleted registration request for username '{username}'")
+        return True
 
     print(f"Username '{username}' not found for deletion.")
     return False
@@ -132,7 +232,9 @@ def delete_registration_request(username, spreadsheet):
 
 def log_registration_event(username, action, admin_username, spreadsheet):
     sheet = ensure_log_sheet(spreadsheet)
-    sheet.append_row([username, action, admin_username, datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
+    row = [username, action, admin_username, datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+    sheet.append_row(row)
+    _append_cached(sheet, row)
 
 def approve_user(user_data, admin_username, spreadsheet):
     users_sheet = ensure_users_sheet(spreadsheet)
@@ -152,16 +254,36 @@ def approve_user(user_data, admin_username, spreadsheet):
     return message
 
 
+# =========================================================
+# USER DIRECTORY
+# =========================================================
+def get_user_directory(sheet):
+    """Users rows keyed by username and by email, from the cached table.
+
+    Returns {"by_username": {...}, "by_email": {...}}; the rows are shared,
+    so callers must not modify them.
+    """
+    with _user_tables()["lock"]:
+        try:
+            table = _table(sheet)
+        except APIError as e:
+            st.error("❌ Failed to load users from sheet.")
+            st.write("Error details:", e)
+            raise  # Re-raise the error after logging
+        if table["directory"] is None:
+            by_username, by_email = {}, {}
+            for user in table["records"]:
+                # First row wins, as the sheet scans it did.
+                by_username.setdefault(user["Username"], user)
+                by_email.setdefault(user["Email"], user)
+            table["directory"] = {"by_username": by_username, "by_email": by_email}
+        return table["directory"]
+
+
 def load_users_from_sheet(sheet):
-    try:
-        users = sheet.get_all_records()
-    except APIError as e:
-        st.error("❌ Failed to load users from sheet.")
-        st.write("Error details:", e)
-        raise  # Re-raise the error after logging
     credentials = {"usernames": {}}
-    for user in users:
-        credentials["usernames"][user["Username"]] = {
+    for username, user in get_user_directory(sheet)["by_username"].items():
+        credentials["usernames"][username] = {
             "name": user["Full Name"],
             "email": user["Email"],
             "password": user["Password"]
@@ -170,9 +292,5 @@ def load_users_from_sheet(sheet):
 
 
 def get_user_role(username, sheet):
-    users = sheet.get_all_records()
-    for user in users:
-        if user["Username"] == username:
-            return user["Role"]
-    return "officer"
-
+    user = get_user_directory(sheet)["by_username"].get(username)
+    return user["Role"] if user is not None else "officer"
@@ -0,0 +1,219 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from modules.sheets_scheduler import SAFE_RETRY_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+def not_applied(error):
+    """True when a failed append certainly did not reach the sheet."""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in SAFE_RETRY_STATUSES
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RowSpool:
+    """SQLite file holding rows that were acknowledged but not yet appended.
+
+    Each row is owned by the process that spooled it. ``claim_orphans``
+    hands rows left behind by processes that are no longer running to the
+    caller, so a restart replays them exactly once per host.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool (id INTEGER PRIMARY KEY, owner INTEGER, row TEXT)"
+        )
+        self._lock = threading.Lock()
+        self.owner = os.getpid()
+
+    def add(self, row):
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO spool (owner, row) VALUES (?, ?)", (self.owner, json.dumps(row))
+            )
+            return cur.lastrowid
+
+    def remove(self, ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM spool WHERE id = ?", [(i,) for i in ids])
+
+    def claim_orphans(self):
+        """[(id, row)] spooled by dead processes, now owned by this one."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                owners = [o for (o,) in self._conn.execute("SELECT DISTINCT owner FROM spool")]
+                rows = []
+                for owner in owners:
+                    if owner == self.owner or _pid_alive(owner):
+                        continue
+                    rows += self._conn.execute(
+                        "SELECT id, row FROM spool WHERE owner = ?", (owner,)
+                    ).fetchall()
+                    self._conn.execute("UPDATE spool SET owner = ? WHERE owner = ?", (self.owner, owner))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        rows.sort()
+        return [(row_id, json.loads(row)) for row_id, row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+
+class SheetWriteBuffer:
+    """Groups appended rows into ``append_rows(rows)`` batches.
+
+    Rows are flushed when ``max_rows`` are waiting or the oldest row has
+    waited ``max_delay`` seconds. Each ``submit`` returns a Future that
+    resolves to the batch size once the row is in the sheet. A row is only
+    removed from the buffer after the API call that carried it succeeded;
+    failed batches stay queued and are retried after ``retry_delay``.
+
+    With a ``spool``, every row is written to it before ``submit`` returns
+    and removed only once its append is confirmed; rows orphaned by a
+    crashed process are queued again on start. A row whose append may have
+    landed (a failure other than 429/503, or a replayed row) is only sent
+    again after ``find_written(rows)`` (a bool per row) says it is missing.
+    """
+
+    def __init__(self, append_rows, max_rows=25, max_delay=2.0, retry_delay=5.0, spool=None, find_written=None):
+        self.append_rows = append_rows
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+        self.spool = spool
+        self.find_written = find_written
+        self.last_error = None
+
+        self._pending = deque()  # [row, future, queued_at, spool id, maybe written]
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._retry_at = 0.0
+        if spool is not None:
+            now = time.monotonic()
+            for row_id, row in spool.claim_orphans():
+                self._pending.append([row, Future(), now, row_id, True])
+        self._thread = threading.Thread(target=self._run, name="sheet-write-buffer", daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        row = list(row)
+        row_id = self.spool.add(row) if self.spool is not None else None
+        future = Future()
+        with self._cond:
+            self._pending.append([row, future, time.monotonic(), row_id, False])
+            self._cond.notify()
+        return future
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self):
+        """Send everything that is queued now. Returns the number of rows written."""
+        written = 0
+        while True:
+            with self._cond:
+                if not self._pending:
+                    return written
+            sent = self._flush_once()
+            if not sent:
+                return written
+            written += sent
+
+    def _failed(self, e, what):
+        # Keep every row queued; they go out with the next attempt.
+        self.last_error = e
+        with self._cond:
+            self._retry_at = time.monotonic() + self.retry_delay
+        logger.warning("%s failed, will retry in %.0fs", what, self.retry_delay, exc_info=True)
+
+    def _flush_once(self):
+        with self._flush_lock:
+            with self._cond:
+                batch = list(self._pending)[: self.max_rows]
+            if not batch:
+                return 0
+
+            landed = []
+            if self.find_written is not None and any(entry[4] for entry in batch):
+                try:
+                    written = self.find_written([entry[0] for entry in batch])
+                except Exception as e:
+                    self._failed(e, f"Checking {len(batch)} buffered rows")
+                    return 0
+                landed = [entry for entry, done in zip(batch, written) if done]
+                batch = [entry for entry, done in zip(batch, written) if not done]
+                for entry in batch:
+                    entry[4] = False
+                self._complete(landed)
+                if not batch:
+                    return len(landed)
+
+            try:
+                self.append_rows([entry[0] for entry in batch])
+            except Exception as e:
+                if not not_applied(e):
+                    # The append may have been applied; check before resending.
+                    for entry in batch:
+                        entry[4] = True
+                self._failed(e, f"Buffered write of {len(batch)} rows")
+                return len(landed)
+
+            self._complete(batch)
+            self.last_error = None
+            return len(landed) + len(batch)
+
+    def _complete(self, batch):
+        if not batch:
+            return
+        if self.spool is not None:
+            self.spool.remove([entry[3] for entry in batch])
+        done = {id(entry) for entry in batch}
+        with self._cond:
+            self._pending = deque(entry for entry in self._pending if id(entry) not in done)
+            self._retry_at = 0.0
+        for entry in batch:
+            entry[1].set_result(len(batch))
+
+    def _due_in(self):
+        # Seconds until the next flush is due, or None when idle.
+        if not self._pending:
+            return None
+        now = time.monotonic()
+        if now < self._retry_at:
+            return self._retry_at - now
+        if len(self._pending) >= self.max_rows:
+            return 0
+        return max(0.0, self._pending[0][2] + self.max_delay - now)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                wait = self._due_in()
+                while wait is None or wait > 0:
+                    self._cond.wait(timeout=wait)
+                    wait = self._due_in()
+            self._flush_once()
@@ -1,175 +1,568 @@
-import json
-import math
+import atexit
+import hashlib
+import itertools
+import logging
+import os
+import re
+import tempfile
+import threading
 import time
-from datetime import datetime
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
 
-import gspread
 import numpy as np
 import pandas as pd
 import streamlit as st
 from gspread.exceptions import APIError, WorksheetNotFound
-from oauth2client.service_account import ServiceAccountCredentials
-
-from constants import SPREADSHEET_ID, MAIN_SHEET, MERGED_SHEET, CALC_SHEET
+from gspread.utils import rowcol_to_a1
+
+from constants import MAIN_SHEET, MERGED_SHEET, DELETED_SHEET
+from modules.sheets_client import (
+    add_worksheet,
+    get_spreadsheet,
+    get_worksheet,
+    set_header,
+)
+from modules.chunked_writer import DEFAULT_CHUNK_ROWS, WriteCheckpoints, write_table_chunked
+from modules.pipeline import (
+    MERGE_KEYS,
+    OBSERVATION_COLUMNS,
+    SOURCE_ROW_COL,
+    TOMBSTONE_COLUMNS,
+    TOMBSTONE_FLAG,
+    WRITE_ID_COLUMN,
+    SiteDayIndex,
+    apply_schema,
+    concat_typed,
+    convert_timestamps_to_string,
+    drop_tombstones,
+    filter_records,
+    find_invalid_json_cell,
+    make_unique_headers,
+    merge_start_stop,
+    pair_new_rows,
+    pair_with_sources,
+    sanitize_for_google_sheets,
+    sheet_text,
+    tombstoned_rows,  # noqa: F401 - re-exported for components/edit_data_entry_form.py
+    validate_json_payload,
+)
+from modules.sheets_scheduler import BACKGROUND, sheets_lane
+from modules.sqlite_replica import SheetReplica
+from modules.storage import MemoryBackend, SheetsBackend, SQLiteBackend, TableRef
+from modules.write_buffer import RowSpool, SheetWriteBuffer
+
+logger = logging.getLogger(__name__)
 
 
 # =========================================================
 # GOOGLE SHEETS SETUP
 # =========================================================
-creds_json = st.secrets["GOOGLE_CREDENTIALS"]
-creds_dict = json.loads(creds_json)
-
-scope = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive",
-]
+# Opened on first use rather than at import, so importing a page costs no
+# network time before it is shown.
+@st.cache_resource
+def get_sheets_storage():
+    return SheetsBackend(get_spreadsheet())
+
+
+@st.cache_resource
+def get_storage():
+    """Backend for table reads and writes, chosen by the STORAGE_BACKEND secret.
+
+    ``sheets`` (default), ``memory`` or ``sqlite`` (at STORAGE_PATH).
+    """
+    backend = st.secrets.get("STORAGE_BACKEND", "sheets")
+    if backend == "sheets":
+        return get_sheets_storage()
+    if backend == "memory":
+        storage = MemoryBackend()
+    elif backend == "sqlite":
+        storage = SQLiteBackend(st.secrets.get("STORAGE_PATH", "pm25_storage.sqlite3"))
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
 
-creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-client = gspread.authorize(creds)
-spreadsheet = client.open_by_key(SPREADSHEET_ID)
+    if MAIN_SHEET not in storage.list_tables():
+        storage.write_table(MAIN_SHEET, [MAIN_COLUMNS])
+    else:
+        _add_missing_main_columns(storage, MAIN_SHEET, storage.read_header(MAIN_SHEET))
+    return storage
 
 
 # =========================================================
 # SHEET INITIALIZATION
 # =========================================================
+MAIN_COLUMNS = OBSERVATION_COLUMNS + TOMBSTONE_COLUMNS + [WRITE_ID_COLUMN]
+
+
+def _add_missing_main_columns(storage, sheet_name, header):
+    """Append the columns an older main sheet lacks, in place. False if the header is unknown."""
+    while header and header[-1] == "":
+        header = header[:-1]
+    if len(header) < len(OBSERVATION_COLUMNS) or MAIN_COLUMNS[:len(header)] != header:
+        return False
+    if len(header) < len(MAIN_COLUMNS):
+        # Sheet predates soft delete or write ids.
+        storage.update_range(
+            sheet_name, f"{_column_letter(len(header) + 1)}1", [MAIN_COLUMNS[len(header):]]
+        )
+    return True
+
+
 def ensure_main_sheet_initialized(spreadsheet, sheet_name):
-    expected_header = [
-        "Entry Type",
-        "ID",
-        "Site",
-        "Latitude",
-        "Longitude",
-        "Monitoring Officer",
-        "Driver",
-        "Date",
-        "Time",
-        "Temperature (°C)",
-        "RH (%)",
-        "Pressure (mbar)",
-        "Weather",
-        "Wind Speed",
-        "Wind Direction",
-        "Elapsed Time (min)",
-        "Flow Rate (L/min)",
-        "Observation",
-        "Submitted By",
-        "Submitted At",
-    ]
+    expected_header = MAIN_COLUMNS
 
     try:
-        ws = spreadsheet.worksheet(sheet_name)
+        ws = get_worksheet(spreadsheet, sheet_name)
     except WorksheetNotFound:
-        ws = spreadsheet.add_worksheet(title=sheet_name, rows="100", cols="20")
+        ws = add_worksheet(spreadsheet, title=sheet_name, rows="100", cols=str(len(expected_header)))
 
     all_values = ws.get_all_values()
 
     if not all_values:
         ws.append_row(expected_header)
-    else:
-        current_header = all_values[0]
-        if current_header != expected_header:
-            ws.clear()
-            ws.append_row(expected_header)
+    elif not _add_missing_main_columns(get_sheets_storage(), sheet_name, all_values[0]):
+        ws.clear()
+        ws.append_row(expected_header)
+    set_header(spreadsheet, sheet_name, expected_header)
 
     return ws
 
 
-sheet = ensure_main_sheet_initialized(spreadsheet, MAIN_SHEET)
+def table_handle(name):
+    """Worksheet for ``name`` on Sheets, a ``TableRef`` on a local backend."""
+    if isinstance(get_storage(), SheetsBackend):
+        return get_worksheet(get_spreadsheet(), name)
+    return TableRef(name)
 
 
-# =========================================================
-# GENERAL UTILITIES
-# =========================================================
-def convert_timestamps_to_string(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    for col in df.select_dtypes(include=["datetime64[ns]", "datetime64[ns, UTC]"]).columns:
-        df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S")
-    return df
+@st.cache_resource
+def get_main_sheet():
+    if not isinstance(get_storage(), SheetsBackend):
+        # get_storage already created the table with its header.
+        return TableRef(MAIN_SHEET)
+    return ensure_main_sheet_initialized(get_spreadsheet(), MAIN_SHEET)
 
 
-def make_unique_headers(headers):
-    seen = {}
-    unique_headers = []
+_LAZY_GLOBALS = {"spreadsheet": get_spreadsheet, "sheets_storage": get_sheets_storage, "sheet": get_main_sheet}
 
-    for h in headers:
-        if h == "":
-            h = "Unnamed"
 
-        if h in seen:
-            seen[h] += 1
-            unique_headers.append(f"{h}.{seen[h]}")
-        else:
-            seen[h] = 0
-            unique_headers.append(h)
+def __getattr__(name):
+    # ``from resource import sheet`` (and spreadsheet, sheets_storage) opens
+    # it when the importing page is loaded.
+    if name in _LAZY_GLOBALS:
+        return _LAZY_GLOBALS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    return unique_headers
 
+# =========================================================
+# GENERAL UTILITIES
+# =========================================================
+# Loaded with their declared column types (see modules/pipeline.py).
+TYPED_SHEETS = [MAIN_SHEET, MERGED_SHEET]
 
-def load_data_from_sheet(sheet):
-    try:
-        all_values = sheet.get_all_values()
-        if not all_values:
-            return pd.DataFrame()
 
-        headers = make_unique_headers(all_values[0])
-        rows = all_values[1:]
+def values_to_dataframe(all_values, typed=False):
+    if not all_values:
+        return pd.DataFrame()
+
+    headers = make_unique_headers(all_values[0])
+    rows = all_values[1:]
+
+    if not rows:
+        return pd.DataFrame(columns=headers)
 
-        if not rows:
-            return pd.DataFrame(columns=headers)
+    df = pd.DataFrame(rows, columns=headers)
+    return apply_schema(df) if typed else convert_timestamps_to_string(df)
 
-        df = pd.DataFrame(rows, columns=headers)
-        return convert_timestamps_to_string(df)
 
-    except APIError as e:
+def show_load_error(e):
+    if isinstance(e, APIError):
         st.error(f"❌ APIError: {e.response.status_code} - {e.response.reason}")
         try:
             st.text(f"Details: {e.response.text}")
         except Exception:
             pass
+    else:
+        st.error(f"❌ Unexpected error: {e}")
+
+
+def load_data_from_sheet(sheet):
+    try:
+        return values_to_dataframe(get_storage().read_table(sheet.title), typed=sheet.title in TYPED_SHEETS)
+    except Exception as e:
+        show_load_error(e)
         return pd.DataFrame()
 
+
+# =========================================================
+# INCREMENTAL READER
+# =========================================================
+# A snapshot older than this is reloaded in full, which catches edits the
+# fingerprint cannot see (middle rows changed by hand or by another process).
+SNAPSHOT_MAX_AGE_SECONDS = 300
+
+
+@st.cache_resource
+def _sheet_snapshots():
+    # Process-wide: {worksheet id: snapshot}, shared by every session. Each
+    # snapshot content gets a new number from "versions".
+    return {"lock": threading.Lock(), "by_sheet": {}, "versions": itertools.count(1)}
+
+
+def _column_letter(col):
+    return re.sub(r"\d", "", rowcol_to_a1(1, col))
+
+
+def _fingerprint(values):
+    digest = hashlib.sha1()
+    for value in values:
+        digest.update(value.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def _fingerprint_columns(columns, n_rows):
+    # Padded to n_rows so trailing blanks trimmed by the API compare equal.
+    cells = []
+    for column in columns:
+        cells += column + [""] * (n_rows - len(column))
+    return _fingerprint(cells)
+
+
+def _columns_of(values, col_indexes):
+    return [[row[col] if col < len(row) else "" for row in values] for col in col_indexes]
+
+
+def _pad_rows(rows, width):
+    return [row + [""] * (width - len(row)) for row in rows]
+
+
+def _take_snapshot(sheet, fingerprint_cols):
+    all_values = sheet.get_all_values()
+    header = all_values[0] if all_values else []
+    col_indexes = [header.index(col) for col in fingerprint_cols if col in header] or [0]
+    typed = sheet.title in TYPED_SHEETS
+    return {
+        "values": all_values,
+        "width": len(header),
+        "col_indexes": col_indexes,
+        "fingerprint": _fingerprint_columns(_columns_of(all_values, col_indexes), len(all_values)),
+        "typed": typed,
+        "df": values_to_dataframe(all_values, typed=typed),
+        "taken_at": time.monotonic(),
+    }
+
+
+def _snapshot_expired(snap):
+    max_age = float(st.secrets.get("SNAPSHOT_MAX_AGE_SECONDS", SNAPSHOT_MAX_AGE_SECONDS))
+    return time.monotonic() - snap["taken_at"] > max_age
+
+
+def _refresh_snapshot(sheet, snap):
+    """Fetch rows appended since ``snap`` was taken.
+
+    Returns False when the sheet was edited, deleted from or reordered above
+    the last known row, in which case the caller must reload everything.
+    """
+    values = snap["values"]
+    n, width = len(values), snap["width"]
+    if not values or width == 0:
+        return False
+
+    ranges = []
+    for col in snap["col_indexes"]:
+        letter = _column_letter(col + 1)
+        ranges.append(f"{letter}1:{letter}{n}")
+    ranges.append(f"A{n}:{_column_letter(width)}")
+    *fp_ranges, tail = sheet.batch_get(ranges)
+
+    # The last known row comes back with the new ones, so edits to the tail
+    # are caught as well as edits that change a fingerprint column.
+    tail = _pad_rows([list(r) for r in tail], width)
+    fp_now = _fingerprint_columns([[r[0] if r else "" for r in column] for column in fp_ranges], n)
+    if not tail or tail[0] != values[-1] or fp_now != snap["fingerprint"]:
+        return False
+
+    new_rows = tail[1:]
+    if new_rows:
+        snap["values"] = values + new_rows
+        snap["fingerprint"] = _fingerprint_columns(
+            _columns_of(snap["values"], snap["col_indexes"]), len(snap["values"])
+        )
+        new_df = pd.DataFrame(new_rows, columns=snap["df"].columns)
+        new_df.index = range(len(snap["df"]), len(snap["df"]) + len(new_rows))
+        # Only the new rows are parsed; the rest keep their types.
+        new_df = apply_schema(new_df) if snap["typed"] else convert_timestamps_to_string(new_df)
+        snap["df"] = concat_typed([snap["df"], new_df])
+        snap["version"] = None
+    return True
+
+
+def invalidate_sheet_snapshot(sheet):
+    cache = _sheet_snapshots()
+    with cache["lock"]:
+        cache["by_sheet"].pop(sheet.id, None)
+    get_replica().request_sync()
+
+
+def _current_snapshot(cache, sheet, fingerprint_cols=("Submitted At", "Deleted")):
+    # Caller holds cache["lock"].
+    snap = cache["by_sheet"].get(sheet.id)
+    if snap is not None and _snapshot_expired(snap):
+        fresh = _take_snapshot(sheet, fingerprint_cols)
+        if fresh["values"] == snap["values"]:
+            snap["taken_at"] = fresh["taken_at"]
+        else:
+            snap = cache["by_sheet"][sheet.id] = fresh
+    elif snap is None or not _refresh_snapshot(sheet, snap):
+        snap = _take_snapshot(sheet, fingerprint_cols)
+        cache["by_sheet"][sheet.id] = snap
+    if snap.get("version") is None:
+        snap["version"] = next(cache["versions"])
+    return snap
+
+
+def load_data_incremental(sheet, include_deleted=False, fingerprint_cols=("Submitted At", "Deleted")):
+    """Cached equivalent of ``load_data_from_sheet``.
+
+    After the first full read, each call costs one ``batch_get`` that returns
+    the fingerprint columns plus any appended rows; a full reload happens
+    when an edit or delete is detected, and at least every
+    SNAPSHOT_MAX_AGE_SECONDS for edits the fingerprint misses (a reload that
+    finds nothing changed keeps the data version). Tombstoned rows are dropped
+    unless ``include_deleted``; the index still gives each row's position.
+    ``df.attrs["data_version"]`` identifies the snapshot the frame came
+    from (see ``site_day_index``).
+    """
+    storage = get_storage()
+    cache = _sheet_snapshots()
+    try:
+        if not isinstance(storage, SheetsBackend):
+            # Local backends are cheap to read in full.
+            df = values_to_dataframe(storage.read_table(sheet.title), typed=sheet.title in TYPED_SHEETS)
+            return df if include_deleted else drop_tombstones(df)
+
+        with cache["lock"]:
+            snap = _current_snapshot(cache, sheet, fingerprint_cols)
+            df, version = snap["df"], (sheet.id, snap["version"], include_deleted)
+        df = df.copy() if include_deleted else drop_tombstones(df)
+        df.attrs[DATA_VERSION_ATTR] = version
+        return df
     except Exception as e:
-        st.error(f"❌ Unexpected error: {e}")
+        show_load_error(e)
         return pd.DataFrame()
 
 
+def _observations_written(rows):
+    """For each row, whether the main sheet already holds it (same Write ID).
+
+    Rows queued before write ids existed have none and count as missing: a
+    possible duplicate is better than a lost row.
+    """
+    storage = get_storage()
+    header = storage.read_header(MAIN_SHEET)
+    if WRITE_ID_COLUMN not in header:
+        return [False] * len(rows)
+    col = header.index(WRITE_ID_COLUMN)
+    if isinstance(storage, SheetsBackend):
+        # Only the Write ID column, in one read.
+        letter = _column_letter(col + 1)
+        ws = get_worksheet(get_spreadsheet(), MAIN_SHEET)
+        written = {r[0] for r in ws.batch_get([f"{letter}2:{letter}"])[0] if r}
+    else:
+        written = {r[col] for r in storage.read_table(MAIN_SHEET)[1:] if len(r) > col and r[col]}
+    position = MAIN_COLUMNS.index(WRITE_ID_COLUMN)
+    return [len(row) > position and str(row[position]) in written for row in rows]
+
+
+@st.cache_resource
+def get_observation_writer():
+    # One buffer per process so submissions from all sessions share batches.
+    # Rows are spooled to disk until appended, and a restart replays them.
+    path = st.secrets.get("WRITE_SPOOL_PATH", os.path.join(tempfile.gettempdir(), "pm25_write_spool.sqlite3"))
+    writer = SheetWriteBuffer(
+        lambda rows: get_storage().append_rows(MAIN_SHEET, rows),
+        spool=RowSpool(path),
+        find_written=_observations_written,
+    )
+    atexit.register(writer.flush)
+    return writer
+
+
 def add_data(row, username):
+    """Queue a row for the main sheet and return its acknowledgement Future."""
     row.append(username)
     row.append(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    sheet.append_row(row)
+    # Empty tombstone, then the row's Write ID.
+    row += [""] * len(TOMBSTONE_COLUMNS) + [uuid.uuid4().hex]
+    ack = get_observation_writer().submit(row)
+    ack.add_done_callback(lambda _: get_replica().request_sync())
+    return ack
+
+
+# =========================================================
+# LOCAL READ REPLICA
+# =========================================================
+# Only the sheets query_replica serves; never Users (password hashes).
+REPLICATED_SHEETS = [MAIN_SHEET]
+REPLICA_SYNC_SECONDS = 30
+
+
+def _fetch_replicated_sheets():
+    storage = get_storage()
+    if not isinstance(storage, SheetsBackend):
+        return {title: storage.read_table(title) for title in storage.list_tables() if title in REPLICATED_SHEETS}
+
+    # Served from the incremental snapshot, so a sync costs the same single
+    # delta batch_get as load_data_incremental rather than a full download.
+    cache = _sheet_snapshots()
+    with sheets_lane(BACKGROUND), cache["lock"]:
+        return {MAIN_SHEET: _current_snapshot(cache, get_main_sheet())["values"]}
+
+
+@st.cache_resource
+def get_replica():
+    # Default: a fresh directory only this user can read. The replica is
+    # rebuilt from the sheet on start, so nothing needs to survive restarts.
+    path = st.secrets.get("REPLICA_PATH") or os.path.join(
+        tempfile.mkdtemp(prefix="pm25_replica_"), "replica.sqlite3"
+    )
+    replica = SheetReplica(path)
+    replica.start(_fetch_replicated_sheets, float(st.secrets.get("REPLICA_SYNC_SECONDS", REPLICA_SYNC_SECONDS)))
+    return replica
+
+
+def query_replica(title, site=None, date_range=None, date_col="Submitted At", include_deleted=False):
+    """Indexed Site / date read of ``title`` from the local replica.
+
+    Returns None when the replica has not synced ``title`` within two sync
+    intervals, so callers can fall back to reading the sheet.
+    """
+    replica = get_replica()
+    if not replica.has(title, max_age=2 * replica.interval):
+        return None
+
+    equals = {"Site": site} if site and site != "All" else {}
+    ranges = {}
+    if date_range and len(date_range) == 2:
+        start, end = date_range
+        # Dates and timestamps are stored as ISO text, so a day range is a
+        # string range the index can serve.
+        ranges[date_col] = (start.isoformat(), (end + timedelta(days=1)).isoformat())
+
+    df = replica.query(title, equals, ranges)
+    if title in TYPED_SHEETS:
+        df = apply_schema(df)
+    return df if include_deleted else drop_tombstones(df)
+
+
+# =========================================================
+# BULK UPSERT
+# =========================================================
+def upsert_rows(ws, keys, rows, existing_keys, value_input_option="USER_ENTERED"):
+    """Write ``rows`` into ``ws`` by key with at most two API calls.
+
+    ``existing_keys`` maps a key to its 0-based data row index (row 2 in the
+    sheet is index 0). Rows with a known key are overwritten in place with
+    one ``batch_update``; the others go out in one ``append_rows``.
+    Returns ``(updated, added)``.
+    """
+    updates, appends = [], []
+    for key, row in zip(keys, rows):
+        if key in existing_keys:
+            row_number = existing_keys[key] + 2
+            updates.append({
+                "range": f"A{row_number}:{_column_letter(len(row))}{row_number}",
+                "values": [row],
+            })
+        else:
+            appends.append(row)
+
+    if updates:
+        ws.batch_update(updates)
+    if appends:
+        ws.append_rows(appends, value_input_option=value_input_option)
+    return len(updates), len(appends)
+
+
+# =========================================================
+# SITE / DAY INDEX
+# =========================================================
+DATA_VERSION_ATTR = "data_version"
+SITE_DAY_INDEX_CACHE_SIZE = 8
+
+
+@st.cache_resource
+def _site_day_indexes():
+    # Process-wide: {(data version, site col, date col): SiteDayIndex}, oldest first.
+    return {"lock": threading.Lock(), "by_key": OrderedDict()}
+
+
+def site_day_index(df, site_col="Site", date_col="Submitted At"):
+    """Cached SiteDayIndex for a frame returned by ``load_data_incremental``.
+
+    Built once per data version and shared by every session. Returns None
+    for frames without a version, or whose rows no longer line up with the
+    index (filtered or reordered since loading); callers then scan.
+    """
+    version = df.attrs.get(DATA_VERSION_ATTR)
+    if version is None or site_col not in df.columns or date_col not in df.columns:
+        return None
+
+    key = (version, site_col, date_col)
+    cache = _site_day_indexes()
+    with cache["lock"]:
+        index = cache["by_key"].get(key)
+        if index is not None:
+            cache["by_key"].move_to_end(key)
+    if index is None:
+        index = SiteDayIndex(df, site_col, date_col)
+        with cache["lock"]:
+            cache["by_key"][key] = index
+            while len(cache["by_key"]) > SITE_DAY_INDEX_CACHE_SIZE:
+                cache["by_key"].popitem(last=False)
+    return index if index.labels.equals(df.index) else None
+
+
+def site_options(df, site_col="Site"):
+    """Sorted distinct sites for a filter dropdown."""
+    index = site_day_index(df, site_col)
+    if index is not None:
+        return index.sites
+    return sorted(df[site_col].dropna().astype(str).unique().tolist())
+
+
+def _rows_with_dates(df, positions, date_col):
+    rows = df.iloc[positions]
+    if not pd.api.types.is_datetime64_any_dtype(rows[date_col]):
+        rows = rows.assign(**{date_col: pd.to_datetime(rows[date_col], errors="coerce")})
+    return rows
 
 
 # =========================================================
 # FILTERING / VALIDATION
 # =========================================================
 def filter_by_site_and_date(df, site_col="Site", date_col="Submitted At", context_label=""):
-    df = df.copy()
-
     if site_col not in df.columns or date_col not in df.columns:
         st.warning("Required filter columns are missing.")
-        return df
+        return df.copy()
 
-    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
+    index = site_day_index(df, site_col, date_col) or SiteDayIndex(df, site_col, date_col)
 
     st.markdown(f"### 🔍 Filter Records {context_label}")
-    sites = ["All"] + sorted(df[site_col].dropna().astype(str).unique().tolist())
-
     selected_site = st.selectbox(
         f"Filter by Site {context_label}:",
-        sites,
+        ["All"] + index.sites,
         key=f"{context_label}_site",
     )
 
-    valid_dates = df[date_col].dropna()
-    if valid_dates.empty:
+    bounds = index.date_bounds()
+    if bounds is None:
         st.warning("No valid dates found for filtering.")
-        return df.iloc[0:0]
-
-    min_date = valid_dates.min().date()
-    max_date = valid_dates.max().date()
+        return _rows_with_dates(df, [], date_col)
 
+    min_date, max_date = bounds
     selected_date = st.date_input(
         f"Filter by Date {context_label}:",
         value=min_date,
@@ -178,35 +571,21 @@ def filter_by_site_and_date(df, site_col="Site", date_col="Submitted At", contex
         key=f"{context_label}_date",
     )
 
-    filtered_df = df.copy()
-
-    if selected_site != "All":
-        filtered_df = filtered_df[filtered_df[site_col].astype(str) == selected_site]
-
-    filtered_df = filtered_df[filtered_df[date_col].dt.date == selected_date]
-    return filtered_df
+    return _rows_with_dates(df, index.positions(selected_site, selected_date, selected_date), date_col)
 
 
-def filter_dataframe(df, site_filter=None, date_range=None):
-    if df.empty:
-        return df
-
-    df = df.copy()
-
-    if "Submitted At" in df.columns:
-        df["Submitted At"] = pd.to_datetime(df["Submitted At"], errors="coerce")
+def filter_dataframe(df, site_filter=None, date_range=None, replica_title=None):
+    index = site_day_index(df)
+    if index is not None:
+        start, end = date_range if date_range and len(date_range) == 2 else (None, None)
+        return _rows_with_dates(df, index.positions(site_filter, start, end), "Submitted At")
 
-    if site_filter and site_filter != "All" and "Site" in df.columns:
-        df = df[df["Site"] == site_filter]
-
-    if date_range and len(date_range) == 2 and "Submitted At" in df.columns:
-        start, end = date_range
-        df = df[
-            (df["Submitted At"].dt.date >= start) &
-            (df["Submitted At"].dt.date <= end)
-        ]
+    if replica_title is not None:
+        replica_df = query_replica(replica_title, site_filter, date_range)
+        if replica_df is not None:
+            df = replica_df
 
-    return df
+    return filter_records(df, site_filter, date_range)
 
 
 def validate_inputs(temp, rh, pressure, wind_speed):
@@ -239,286 +618,423 @@ def validate_inputs(temp, rh, pressure, wind_speed):
 
 
 # =========================================================
-# DELETE / RESTORE UTILITIES
+# ROW UPDATES
 # =========================================================
-def backup_deleted_row(row_data, original_sheet_name, row_number, deleted_by):
-    try:
-        backup_sheet = spreadsheet.worksheet("Deleted Records")
-    except Exception:
-        num_columns = len(row_data) + 3
-        backup_sheet = spreadsheet.add_worksheet(
-            title="Deleted Records",
-            rows="1000",
-            cols=str(num_columns),
-        )
+RECORD_IDENTITY_COLUMNS = ["Entry Type", "ID", "Site", "Submitted By", "Submitted At"]
 
-        header = [
-            "Entry Type",
-            "ID",
-            "Site",
-            "Latitude",
-            "Longitude",
-            "Monitoring Officer",
-            "Driver",
-            "Date",
-            "Time",
-            "Temperature (°C)",
-            "RH (%)",
-            "Pressure (mbar)",
-            "Weather",
-            "Wind Speed",
-            "Wind Direction",
-            "Elapsed Time (min)",
-            "Flow Rate (L/min)",
-            "Observation",
-            "Submitted By",
-            "Submitted At",
-            "Deleted At",
-            "Source",
-            "Deleted By",
-        ]
-        backup_sheet.append_row(header)
 
-    deleted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    source = f"{original_sheet_name} - Row {row_number}"
-    backup_sheet.append_row(row_data + [deleted_at, source, deleted_by])
+def update_row_if_unchanged(sheet, row_number, expected, values):
+    """Overwrite ``row_number`` from column A with ``values`` in one range write.
 
+    ``expected`` maps column names to the values the caller saw when it
+    opened the record, typed or as text. If the row no longer holds them
+    (edited, deleted or shifted by someone else) nothing is written and
+    False is returned.
+    """
+    storage = get_storage()
+    header = storage.read_header(sheet.title)
+    if isinstance(storage, SheetsBackend):
+        current = sheet.row_values(row_number)
+    else:
+        table = storage.read_table(sheet.title)
+        current = list(table[row_number - 1]) if row_number <= len(table) else []
+    current += [""] * (len(header) - len(current))
 
-def delete_row(sheet, row_number, deleted_by):
-    row_data = sheet.row_values(row_number)
-    backup_deleted_row(row_data, "Main Sheet", row_number, deleted_by)
-    sheet.delete_rows(row_number)
+    for col, value in expected.items():
+        if col in header and current[header.index(col)] != sheet_text(col, value):
+            return False
 
+    last_col = _column_letter(len(values))
+    storage.update_range(sheet.title, f"A{row_number}:{last_col}{row_number}", [values])
+    invalidate_sheet_snapshot(sheet)
+    return True
 
-def delete_merged_record_by_index(index_to_delete, deleted_by):
-    worksheet = spreadsheet.worksheet(MERGED_SHEET)
-    row_data = worksheet.row_values(index_to_delete + 2)  # skip header row
-    backup_deleted_row(row_data, "Merged Sheet", index_to_delete + 2, deleted_by)
-    worksheet.delete_rows(index_to_delete + 2)
 
+# =========================================================
+# DELETE / RESTORE UTILITIES
+# =========================================================
+DELETED_RECORDS_COLUMNS = OBSERVATION_COLUMNS + ["Deleted At", "Source", "Deleted By"]
 
-def restore_specific_deleted_record(selected_index: int):
-    try:
-        backup_sheet = spreadsheet.worksheet("Deleted Records")
-        deleted_rows = backup_sheet.get_all_values()
 
-        if len(deleted_rows) <= 1:
-            return "❌ No deleted records to restore."
+def _ensure_deleted_records_table(storage):
+    if DELETED_SHEET not in storage.list_tables():
+        storage.write_table(DELETED_SHEET, [DELETED_RECORDS_COLUMNS])
 
-        record_rows = deleted_rows[1:]
 
-        if not (0 <= selected_index < len(record_rows)):
-            return "❌ Invalid selection."
+def backup_deleted_row(row_data, original_sheet_name, row_number, deleted_by):
+    storage = get_storage()
+    _ensure_deleted_records_table(storage)
 
-        selected_row = record_rows[selected_index]
+    deleted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    source = f"{original_sheet_name} - Row {row_number}"
+    storage.append_rows(DELETED_SHEET, [row_data + [deleted_at, source, deleted_by]])
+
+
+def _write_tombstone(storage, table, row_number, tombstone):
+    header = storage.read_header(table)
+    if TOMBSTONE_COLUMNS[0] not in header:
+        storage.update_range(table, f"{_column_letter(len(header) + 1)}1", [TOMBSTONE_COLUMNS])
+        header = header + TOMBSTONE_COLUMNS
+    first = header.index(TOMBSTONE_COLUMNS[0]) + 1
+    last = first + len(TOMBSTONE_COLUMNS) - 1
+    storage.update_range(
+        table,
+        f"{_column_letter(first)}{row_number}:{_column_letter(last)}{row_number}",
+        [tombstone],
+    )
 
-        # Remove Deleted At, Source, Deleted By
-        restored_data = selected_row[:-3]
 
-        sheet.append_row(restored_data)
-        backup_sheet.delete_rows(selected_index + 2)
+def tombstone_row(ws, row_number, deleted_by):
+    """Soft-delete ``row_number`` with one in-place write; no rows shift."""
+    deleted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    _write_tombstone(get_storage(), ws.title, row_number, [TOMBSTONE_FLAG, deleted_by, deleted_at])
 
-        return "✅ Selected deleted record has been restored."
 
-    except Exception as e:
-        return f"❌ Restore failed: {e}"
+def restore_tombstoned_row(ws, row_number):
+    _write_tombstone(get_storage(), ws.title, row_number, [""] * len(TOMBSTONE_COLUMNS))
+    invalidate_sheet_snapshot(ws)
 
 
-# =========================================================
-# MERGE LOGIC
-# =========================================================
-def merge_start_stop(df):
-    df = df.copy()
-    df.columns = df.columns.str.strip()
+def delete_row(sheet, row_number, deleted_by, soft=True):
+    if soft:
+        tombstone_row(sheet, row_number, deleted_by)
+        invalidate_sheet_snapshot(sheet)
+        return
 
-    merge_keys = ["ID", "Site", "Latitude", "Longitude"]
+    storage = get_storage()
+    row_data = storage.read_table(sheet.title)[row_number - 1]
+    # Deleted Records holds the observation columns only.
+    backup_deleted_row(row_data[:len(OBSERVATION_COLUMNS)], "Main Sheet", row_number, deleted_by)
+    storage.delete_rows(sheet.title, [row_number])
+    invalidate_sheet_snapshot(sheet)
 
-    required_cols = merge_keys + ["Entry Type"]
-    if any(col not in df.columns for col in required_cols):
-        return pd.DataFrame()
 
-    start_df = df[df["Entry Type"].astype(str).str.upper() == "START"].copy()
-    stop_df = df[df["Entry Type"].astype(str).str.upper() == "STOP"].copy()
+def delete_merged_record_by_index(index_to_delete, deleted_by, soft=True):
+    row_number = index_to_delete + 2  # skip header row
+    if soft:
+        tombstone_row(table_handle(MERGED_SHEET), row_number, deleted_by)
+        return
 
-    if start_df.empty or stop_df.empty:
-        return pd.DataFrame()
+    storage = get_storage()
+    row_data = storage.read_table(MERGED_SHEET)[row_number - 1]
+    backup_deleted_row(row_data, "Merged Sheet", row_number, deleted_by)
+    storage.delete_rows(MERGED_SHEET, [row_number])
 
-    start_df = start_df.reset_index(drop=True)
-    stop_df = stop_df.reset_index(drop=True)
 
-    start_df["seq"] = start_df.groupby(merge_keys).cumcount() + 1
-    stop_df["seq"] = stop_df.groupby(merge_keys).cumcount() + 1
+def compact_tombstones(ws, source_name="Main Sheet"):
+    """Archive tombstoned rows to Deleted Records, then physically remove them.
 
-    start_df = start_df.rename(
-        columns=lambda x: f"{x}_Start" if x not in merge_keys + ["seq"] else x
-    )
-    stop_df = stop_df.rename(
-        columns=lambda x: f"{x}_Stop" if x not in merge_keys + ["seq"] else x
-    )
+    Runs in the background lane; returns the number of rows removed.
+    """
+    storage = get_storage()
+    with sheets_lane(BACKGROUND):
+        values = storage.read_table(ws.title)
+        if not values or TOMBSTONE_COLUMNS[0] not in values[0]:
+            return 0
 
-    merged = pd.merge(start_df, stop_df, on=merge_keys + ["seq"], how="inner")
+        flag_col = values[0].index(TOMBSTONE_COLUMNS[0])
+        dead = [
+            (row_number, row)
+            for row_number, row in enumerate(values[1:], start=2)
+            if len(row) > flag_col and row[flag_col].strip().upper() == TOMBSTONE_FLAG
+        ]
+        if not dead:
+            return 0
 
-    if "Elapsed Time (min)_Start" in merged.columns and "Elapsed Time (min)_Stop" in merged.columns:
-        merged["Elapsed Time (min)_Start"] = pd.to_numeric(
-            merged["Elapsed Time (min)_Start"], errors="coerce"
-        )
-        merged["Elapsed Time (min)_Stop"] = pd.to_numeric(
-            merged["Elapsed Time (min)_Stop"], errors="coerce"
-        )
-        merged["Elapsed Time Diff (min)"] = (
-            merged["Elapsed Time (min)_Stop"] - merged["Elapsed Time (min)_Start"]
-        )
+        # Deleted Records layout: data columns, Deleted At, Source, Deleted By.
+        archive = [
+            row[:flag_col] + [row[flag_col + 2], f"{source_name} - Row {row_number}", row[flag_col + 1]]
+            for row_number, row in dead
+        ]
+        _ensure_deleted_records_table(storage)
+        storage.append_rows(DELETED_SHEET, archive)
+        storage.delete_rows(ws.title, [row_number for row_number, _ in dead])
+        invalidate_sheet_snapshot(ws)
+    return len(dead)
 
-    flow_start_col = "Flow Rate (L/min)_Start"
-    flow_stop_col = "Flow Rate (L/min)_Stop"
-
-    if flow_start_col in merged.columns and flow_stop_col in merged.columns:
-        merged[flow_start_col] = pd.to_numeric(merged[flow_start_col], errors="coerce")
-        merged[flow_stop_col] = pd.to_numeric(merged[flow_stop_col], errors="coerce")
-        merged["Average Flow Rate (L/min)"] = (
-            merged[flow_start_col] + merged[flow_stop_col]
-        ) / 2
-
-    if "seq" in merged.columns:
-        merged = merged.drop(columns=["seq"])
-
-    desired_order = [
-        "ID",
-        "Site",
-        "Latitude",
-        "Longitude",
-        "Entry Type_Start",
-        "Monitoring Officer_Start",
-        "Driver_Start",
-        "Date_Start",
-        "Time_Start",
-        "Temperature (°C)_Start",
-        "RH (%)_Start",
-        "Pressure (mbar)_Start",
-        "Weather_Start",
-        "Wind Speed_Start",
-        "Wind Direction_Start",
-        "Elapsed Time (min)_Start",
-        "Flow Rate (L/min)_Start",
-        "Observation_Start",
-        "Submitted At_Start",
-        "Entry Type_Stop",
-        "Monitoring Officer_Stop",
-        "Driver_Stop",
-        "Date_Stop",
-        "Time_Stop",
-        "Temperature (°C)_Stop",
-        "RH (%)_Stop",
-        "Pressure (mbar)_Stop",
-        "Weather_Stop",
-        "Wind Speed_Stop",
-        "Wind Direction_Stop",
-        "Elapsed Time (min)_Stop",
-        "Flow Rate (L/min)_Stop",
-        "Observation_Stop",
-        "Submitted At_Stop",
-        "Elapsed Time Diff (min)",
-        "Average Flow Rate (L/min)",
-    ]
-
-    existing_cols = [col for col in desired_order if col in merged.columns]
-    return merged[existing_cols]
 
+RESTORATION_LOG_SHEET = "Restoration Logs"
 
-# =========================================================
-# GOOGLE SHEETS JSON-SAFE SANITIZING
-# =========================================================
-def sanitize_for_google_sheets(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
 
-    for col in df.columns:
-        if pd.api.types.is_datetime64_any_dtype(df[col]):
-            df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+def restore_specific_deleted_record(selected_index: int, restored_by=None, expected=None):
+    """Move Deleted Records row ``selected_index`` (0-based, below the header) back to the main sheet.
 
-    df = df.astype(object)
-
-    def clean_cell(x):
-        if x is None:
-            return ""
+    ``expected`` is the row as the caller saw it; if the table changed
+    since, nothing is restored. With ``restored_by`` the restore is logged
+    to Restoration Logs.
+    """
+    try:
+        storage = get_storage()
+        deleted_rows = storage.read_table(DELETED_SHEET)
 
-        if isinstance(x, np.generic):
-            x = x.item()
+        if len(deleted_rows) <= 1:
+            return "❌ No deleted records to restore."
 
-        try:
-            if pd.isna(x):
-                return ""
-        except Exception:
-            pass
+        record_rows = deleted_rows[1:]
 
-        if isinstance(x, pd.Timestamp):
-            return "" if pd.isna(x) else x.strftime("%Y-%m-%d %H:%M:%S")
+        if not (0 <= selected_index < len(record_rows)):
+            return "❌ Invalid selection."
 
-        if isinstance(x, float):
-            if math.isnan(x) or math.isinf(x):
-                return ""
-            return x
+        selected_row = record_rows[selected_index]
+        if expected is not None and [str(v) for v in expected] != selected_row[:len(expected)]:
+            return "❌ Deleted Records changed since it was loaded; reload and try again."
 
-        if isinstance(x, (str, int, bool)):
-            return x
+        # Remove Deleted At, Source, Deleted By
+        restored_data = selected_row[:-3]
 
-        return str(x)
+        storage.append_rows(MAIN_SHEET, [restored_data])
+        storage.delete_rows(DELETED_SHEET, [selected_index + 2])
+        invalidate_sheet_snapshot(get_main_sheet())
 
-    df = df.apply(lambda col: col.map(clean_cell))
-    df.columns = [str(c) for c in df.columns]
-    return df
+        if restored_by is not None:
+            if RESTORATION_LOG_SHEET not in storage.list_tables():
+                storage.write_table(RESTORATION_LOG_SHEET, [deleted_rows[0] + ["Restored By", "Restored At"]])
+            storage.append_rows(RESTORATION_LOG_SHEET, [selected_row + [restored_by, str(datetime.now())]])
 
+        return "✅ Selected deleted record has been restored."
 
-def validate_json_payload(values):
-    json.dumps({"values": values}, allow_nan=False)
+    except Exception as e:
+        return f"❌ Restore failed: {e}"
 
 
 # =========================================================
 # SAVE MERGED DATA
 # =========================================================
+@st.cache_resource
+def get_write_checkpoints():
+    path = st.secrets.get(
+        "WRITE_CHECKPOINT_PATH", os.path.join(tempfile.gettempdir(), "pm25_write_checkpoints.json")
+    )
+    return WriteCheckpoints(path)
+
+
 def save_merged_data_to_sheet(df, spreadsheet, sheet_name):
     if df.empty:
         st.warning("No merged data to save.")
-        return
+        return False
 
     clean_df = sanitize_for_google_sheets(df)
     values = [clean_df.columns.tolist()] + clean_df.values.tolist()
+    chunk_rows = int(st.secrets.get("MERGED_WRITE_CHUNK_ROWS", DEFAULT_CHUNK_ROWS))
+    progress = st.progress(0.0) if len(values) > chunk_rows else None
+
+    def report(written, total, rows_per_sec):
+        if progress is not None:
+            rate = f" · {rows_per_sec:,.0f} rows/s" if rows_per_sec else ""
+            progress.progress(written / total, text=f"Saved {written:,} of {total:,} rows{rate}")
 
     try:
         validate_json_payload(values)
 
-        try:
-            ws = spreadsheet.worksheet(sheet_name)
-            ws.clear()
-        except WorksheetNotFound:
-            rows = max(len(values) + 10, 1000)
-            cols = max(len(clean_df.columns) + 5, 50)
-            ws = spreadsheet.add_worksheet(
-                title=sheet_name,
-                rows=str(rows),
-                cols=str(cols),
+        # Full rewrites yield to interactive reads and user submissions.
+        with sheets_lane(BACKGROUND):
+            summary = write_table_chunked(
+                get_storage(), sheet_name, values, get_write_checkpoints(),
+                chunk_rows=chunk_rows, on_progress=report,
             )
-
-        ws.update(range_name="A1", values=values)
+        if progress is not None:
+            progress.empty()
+        resumed = f", resumed from row {summary['resumed_from']:,}" if summary["resumed_from"] else ""
+        st.caption(
+            f"💾 Saved {summary['rows']:,} rows to {sheet_name} in {summary['chunks']} chunks "
+            f"({summary['seconds']:.1f}s{resumed})."
+        )
+        return True
 
     except Exception as e:
         st.error(f"❌ Failed to save merged data to Google Sheets: {e}")
+        checkpoint = get_write_checkpoints().get(sheet_name)
+        if checkpoint:
+            st.info(
+                f"{checkpoint['rows_written']:,} of {checkpoint['total']:,} rows were saved. "
+                "Saving the same data again resumes from there."
+            )
 
-        # pinpoint the exact bad value if any remain
+        # pinpoint the exact bad value if any remain (row 1 is the header)
         try:
-            for r, row in enumerate(values):
-                for c, val in enumerate(row):
-                    try:
-                        json.dumps(val, allow_nan=False)
-                    except Exception:
-                        st.write(
-                            f"Bad value at row {r + 1}, col {c + 1}: {repr(val)} | type={type(val)}"
-                        )
-                        return
+            bad = find_invalid_json_cell(clean_df)
+            if bad is not None:
+                r, c, val = bad
+                st.write(
+                    f"Bad value at row {r + 2}, col {c + 1}: {repr(val)} | type={type(val)}"
+                )
+                return False
         except Exception:
             pass
 
         st.write("Preview of cleaned data:")
         st.dataframe(clean_df.head(), use_container_width=True)
+        return False
+
+
+# =========================================================
+# INCREMENTAL MERGE
+# =========================================================
+@st.cache_resource
+def _merge_watermarks():
+    # Process-wide: {merged sheet name: watermark state}.
+    return {"lock": threading.Lock(), "by_sheet": {}}
+
+
+def _row_digests(df):
+    if df.empty:
+        return np.empty(0, dtype=np.uint64)
+    return pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy()
+
+
+def _group_pairs_by_key(merged, clean_df):
+    groups = {}
+    keys = zip(*(merged[col].astype(str) for col in MERGE_KEYS))
+    for i, (key, digest) in enumerate(zip(keys, _row_digests(clean_df))):
+        groups.setdefault(key, []).append((i, digest))
+    return groups
+
+
+def _rebuild_merged_sheet(work, digests, spreadsheet, sheet_name, states):
+    states.pop(sheet_name, None)
+    merged, sources = pair_with_sources(work)
+    if not save_merged_data_to_sheet(merged, spreadsheet, sheet_name):
+        return None
+
+    clean_df = sanitize_for_google_sheets(merged)
+    pairs = {
+        key: [[i + 2, digest] for i, digest in rows]
+        for key, rows in _group_pairs_by_key(merged, clean_df).items()
+    }
+    states[sheet_name] = {
+        "header": clean_df.columns.tolist(),
+        "digests": digests,
+        "pending": np.setdiff1d(np.arange(len(work)), sources),
+        "pairs": pairs,
+        "n_rows": len(merged),
+    }
+    return {"added": len(merged), "updated": 0, "removed": 0}
+
+
+def _append_new_pairs(work, digests, state, ws):
+    # Only rows that are still unpaired or arrived since the last sync can
+    # form new pairs; everything below the watermark is already merged.
+    merged, pending = pair_new_rows(work, state["pending"], len(state["digests"]))
+    stats = {"added": len(merged), "updated": 0, "removed": 0}
+
+    if not merged.empty:
+        clean_df = sanitize_for_google_sheets(merged)
+        if clean_df.columns.tolist() != state["header"]:
+            return None
+        ws.append_rows(clean_df.values.tolist())
+        first_row = state["n_rows"] + 2
+        for key, rows in _group_pairs_by_key(merged, clean_df).items():
+            state["pairs"].setdefault(key, []).extend(
+                [first_row + i, digest] for i, digest in rows
+            )
+        state["n_rows"] += len(merged)
+
+    state["digests"] = digests
+    state["pending"] = pending
+    return stats
+
+
+def _rewrite_changed_pairs(work, digests, state, ws, spreadsheet):
+    # An upstream row was edited or deleted: re-pair in memory, then write
+    # only the pairs whose content changed.
+    merged, sources = pair_with_sources(work)
+    clean_df = sanitize_for_google_sheets(merged)
+    if not merged.empty and clean_df.columns.tolist() != state["header"]:
+        return None
+
+    new_groups = _group_pairs_by_key(merged, clean_df) if not merged.empty else {}
+    updates, appends, deletes = [], [], []
+    pairs = {}
+    for key in set(state["pairs"]) | set(new_groups):
+        old_rows = state["pairs"].get(key, [])
+        new_rows = new_groups.get(key, [])
+        kept = []
+        for (row, old_digest), (i, digest) in zip(old_rows, new_rows):
+            if old_digest != digest:
+                updates.append((row, i))
+            kept.append([row, digest])
+        appends.extend((key, i, digest) for i, digest in new_rows[len(old_rows):])
+        deletes.extend(row for row, _ in old_rows[len(new_rows):])
+        if kept:
+            pairs[key] = kept
+
+    values = clean_df.values.tolist()
+    last_col = _column_letter(len(state["header"]))
+    if updates:
+        ws.batch_update([
+            {"range": f"A{row}:{last_col}{row}", "values": [values[i]]}
+            for row, i in updates
+        ])
+
+    if deletes:
+        deletes = sorted(deletes)
+        get_sheets_storage().delete_rows(ws.title, deletes)
+        shifted = np.array(deletes)
+        for rows in pairs.values():
+            for entry in rows:
+                entry[0] -= int(np.searchsorted(shifted, entry[0]))
+
+    n_rows = state["n_rows"] - len(deletes)
+    if appends:
+        ws.append_rows([values[i] for _, i, _ in appends])
+        for offset, (key, _, digest) in enumerate(appends):
+            pairs.setdefault(key, []).append([n_rows + 2 + offset, digest])
+        n_rows += len(appends)
+
+    state.update({
+        "digests": digests,
+        "pending": np.setdiff1d(np.arange(len(work)), sources),
+        "pairs": pairs,
+        "n_rows": n_rows,
+    })
+    return {"added": len(appends), "updated": len(updates), "removed": len(deletes)}
+
+
+def sync_merged_records(df, spreadsheet, sheet_name):
+    """Bring the merged sheet in line with the full Observations frame ``df``.
+
+    Keeps a per-process watermark of the Observations rows already paired.
+    New rows are paired with the still-unmatched ones and appended; when an
+    upstream row was edited or deleted, only the affected pairs are
+    rewritten. The first sync in a process, or one that finds the sheet
+    changed by someone else, falls back to a full rewrite.
+
+    Returns counts of added, updated and removed merged rows, or None when
+    the sheet could not be written.
+    """
+    if df.empty:
+        return None
+
+    work = df.copy()
+    work.columns = work.columns.str.strip()
+    digests = _row_digests(work)
+    work[SOURCE_ROW_COL] = np.arange(len(work))
+
+    cache = _merge_watermarks()
+    with cache["lock"], sheets_lane(BACKGROUND):
+        states = cache["by_sheet"]
+        state = states.get(sheet_name)
+        if state is not None and np.array_equal(digests, state["digests"]):
+            return {"added": 0, "updated": 0, "removed": 0}
+
+        stats = None
+        # Local backends are rewritten in full; only Sheets is worth patching.
+        if state is not None and isinstance(get_storage(), SheetsBackend):
+            try:
+                ws = get_worksheet(spreadsheet, sheet_name)
+                if len(ws.col_values(1)) == state["n_rows"] + 1:
+                    old = state["digests"]
+                    if len(digests) >= len(old) and np.array_equal(digests[: len(old)], old):
+                        stats = _append_new_pairs(work, digests, state, ws)
+                    else:
+                        stats = _rewrite_changed_pairs(work, digests, state, ws, spreadsheet)
+            except Exception:
+                logger.warning("Incremental merge failed, rewriting %s", sheet_name, exc_info=True)
+                stats = None
+
+        if stats is None:
+            stats = _rebuild_merged_sheet(work, digests, spreadsheet, sheet_name, states)
+        return stats
 
 
 # =========================================================
@@ -537,18 +1053,23 @@ def display_and_merge_data(df, spreadsheet, merged_sheet_name):
     with st.expander("🔍 Filter Records"):
         site_filter = st.selectbox(
             "Filter by Site",
-            ["All"] + sorted(df["Site"].dropna().astype(str).unique().tolist()),
+            ["All"] + site_options(df),
         )
         date_range = st.date_input("Filter by Date Range", [])
 
-    filtered_df = filter_dataframe(df, site_filter, date_range)
+    filtered_df = filter_dataframe(df, site_filter, date_range, replica_title=MAIN_SHEET)
     st.dataframe(filtered_df, use_container_width=True)
 
     merged_df = merge_start_stop(filtered_df)
 
     if not merged_df.empty:
-        save_merged_data_to_sheet(merged_df, spreadsheet, merged_sheet_name)
-        st.success("✅ Merged records saved to Google Sheets.")
+        # The sheet always holds the merge of the full table, not the filter.
+        stats = sync_merged_records(df, spreadsheet, merged_sheet_name)
+        if stats is not None:
+            st.success(
+                f"✅ Merged records saved to Google Sheets "
+                f"({stats['added']} added, {stats['updated']} updated, {stats['removed']} removed)."
+            )
         st.dataframe(merged_df, use_container_width=True)
     else:
         st.warning("⚠️ No matching START and STOP records found to merge.")
@@ -0,0 +1,108 @@
+import pytest
+
+# modules.storage imports the Sheets client, which needs Streamlit.
+pytest.importorskip("streamlit")
+
+from modules.chunked_writer import WriteCheckpoints, write_table_chunked  # noqa: E402
+from modules.storage import MemoryBackend, staging_table  # noqa: E402
+
+LIVE = [["Site", "Value"], ["old", "0"]]
+
+
+class FlakyBackend(MemoryBackend):
+    """MemoryBackend that records calls and fails the chosen ones."""
+
+    def __init__(self, tables, fail_update_at=None, fail_swap=False):
+        super().__init__(tables)
+        self.fail_update_at = fail_update_at
+        self.fail_swap = fail_swap
+        self.calls = []
+
+    def write_table(self, name, values):
+        self.calls.append(("write_table", name, len(values)))
+        super().write_table(name, values)
+
+    def update_range(self, name, a1_range, values):
+        self.calls.append(("update_range", name, a1_range))
+        if self.fail_update_at is not None and len(self.calls) >= self.fail_update_at:
+            raise ConnectionError("dropped")
+        super().update_range(name, a1_range, values)
+
+    def swap_table(self, staging, name):
+        if self.fail_swap:
+            raise ConnectionError("dropped")
+        super().swap_table(staging, name)
+
+
+def table(n_rows):
+    return [["Site", "Value"]] + [[f"site {i}", str(i)] for i in range(n_rows)]
+
+
+def test_writes_every_chunk_then_swaps(tmp_path):
+    storage = FlakyBackend({"Merged": LIVE})
+    values = table(25)
+
+    summary = write_table_chunked(storage, "Merged", values, WriteCheckpoints(str(tmp_path / "cp.json")), chunk_rows=10)
+
+    assert storage.read_table("Merged") == values
+    assert staging_table("Merged") not in storage.list_tables()
+    assert summary["chunks"] == 3
+    assert summary["resumed_from"] == 0
+
+
+def test_resume_skips_chunks_already_written(tmp_path):
+    checkpoints = WriteCheckpoints(str(tmp_path / "cp.json"))
+    values = table(45)
+
+    # First block and one update land; the third request fails.
+    storage = FlakyBackend({"Merged": LIVE}, fail_update_at=3)
+    with pytest.raises(ConnectionError):
+        write_table_chunked(storage, "Merged", values, checkpoints, chunk_rows=10)
+    assert storage.read_table("Merged") == LIVE
+    assert checkpoints.get("Merged")["rows_written"] == 20
+
+    storage.fail_update_at = None
+    storage.calls = []
+    summary = write_table_chunked(storage, "Merged", values, checkpoints, chunk_rows=10)
+
+    assert summary["resumed_from"] == 20
+    assert storage.calls == [
+        ("update_range", staging_table("Merged"), "A21"),
+        ("update_range", staging_table("Merged"), "A31"),
+        ("update_range", staging_table("Merged"), "A41"),
+    ]
+    assert storage.read_table("Merged") == values
+    assert checkpoints.get("Merged") is None
+
+
+def test_changed_values_start_over(tmp_path):
+    checkpoints = WriteCheckpoints(str(tmp_path / "cp.json"))
+    storage = FlakyBackend({"Merged": LIVE}, fail_update_at=2)
+    with pytest.raises(ConnectionError):
+        write_table_chunked(storage, "Merged", table(30), checkpoints, chunk_rows=10)
+
+    storage.fail_update_at = None
+    values = table(31)
+    summary = write_table_chunked(storage, "Merged", values, checkpoints, chunk_rows=10)
+
+    assert summary["resumed_from"] == 0
+    assert storage.read_table("Merged") == values
+
+
+def test_failed_swap_leaves_live_table_untouched(tmp_path):
+    checkpoints = WriteCheckpoints(str(tmp_path / "cp.json"))
+    storage = FlakyBackend({"Merged": LIVE}, fail_swap=True)
+    values = table(25)
+
+    with pytest.raises(ConnectionError):
+        write_table_chunked(storage, "Merged", values, checkpoints, chunk_rows=10)
+    assert storage.read_table("Merged") == LIVE
+    assert storage.read_table(staging_table("Merged")) == values
+
+    # The retry only has the swap left to do.
+    storage.fail_swap = False
+    storage.calls = []
+    summary = write_table_chunked(storage, "Merged", values, checkpoints, chunk_rows=10)
+    assert storage.calls == []
+    assert summary["resumed_from"] == len(values)
+    assert storage.read_table("Merged") == values
@@ -0,0 +1,104 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.pipeline import (
+    OBSERVATION_COLUMNS,
+    SOURCE_ROW_COL,
+    TOMBSTONE_COLUMNS,
+    TOMBSTONE_FLAG,
+    merge_start_stop,
+    pair_new_rows,
+)
+
+SITES = [("Kaneshie", "5.5600", "-0.2360"), ("Tema", "5.6698", "-0.0166")]
+
+
+def observation(rng, entry_type, monitor_id, site, minute):
+    name, lat, lon = site
+    row = dict.fromkeys(OBSERVATION_COLUMNS, "")
+    row.update({
+        "Entry Type": entry_type,
+        "ID": monitor_id,
+        "Site": name,
+        "Latitude": lat,
+        "Longitude": lon,
+        "Monitoring Officer": rng.choice(["Ama", "Kofi"]),
+        "Date": "2025-01-01",
+        "Time": f"{minute // 60:02d}:{minute % 60:02d}:00",
+        "Elapsed Time (min)": str(rng.randint(0, 5000)),
+        "Flow Rate (L/min)": f"{rng.uniform(4, 6):.2f}",
+        "Submitted By": "officer",
+        "Submitted At": f"2025-01-01 {minute // 60:02d}:{minute % 60:02d}:00",
+    })
+    return row
+
+
+def random_observations(seed, n_rows):
+    rng = random.Random(seed)
+    rows = [
+        observation(rng, rng.choice(["START", "STOP"]), rng.choice(["M1", "M2", "M3"]), rng.choice(SITES), i)
+        for i in range(n_rows)
+    ]
+    return pd.DataFrame(rows, columns=OBSERVATION_COLUMNS)
+
+
+def sorted_rows(df):
+    return sorted(tuple(str(v) for v in row) for row in df.itertuples(index=False))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_pairing_appended_rows_matches_full_merge(seed):
+    df = random_observations(seed, 60)
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(df)), 4)) + [len(df)]
+
+    sheet, pending, n_seen = [], np.empty(0, dtype=np.int64), 0
+    for cut in cuts:
+        work = df.iloc[:cut].copy()
+        work[SOURCE_ROW_COL] = np.arange(cut)
+        merged, pending = pair_new_rows(work, pending, n_seen)
+        sheet.append(merged)
+        n_seen = cut
+
+    incremental = pd.concat([m for m in sheet if not m.empty], ignore_index=True)
+    full = merge_start_stop(df)
+    assert list(incremental.columns) == list(full.columns)
+    assert sorted_rows(incremental) == sorted_rows(full)
+
+    # Every row not in a pair is still pending.
+    assert len(pending) == len(df) - 2 * len(full)
+
+
+def test_merge_pairs_starts_and_stops_in_order():
+    rng = random.Random(0)
+    site = SITES[0]
+    df = pd.DataFrame([
+        observation(rng, "START", "M1", site, 0),
+        observation(rng, "START", "M1", site, 1),
+        observation(rng, "STOP", "M1", site, 2),
+    ], columns=OBSERVATION_COLUMNS)
+    df["Elapsed Time (min)"] = ["100", "200", "160"]
+
+    merged = merge_start_stop(df)
+
+    assert len(merged) == 1
+    assert merged["Time_Start"].iloc[0] == "00:00:00"
+    assert merged["Elapsed Time Diff (min)"].iloc[0] == 60
+
+
+def test_merge_ignores_tombstoned_rows():
+    rng = random.Random(0)
+    site = SITES[0]
+    df = pd.DataFrame([
+        observation(rng, "START", "M1", site, 0),
+        observation(rng, "STOP", "M1", site, 1),
+        observation(rng, "STOP", "M1", site, 2),
+    ], columns=OBSERVATION_COLUMNS)
+    df[TOMBSTONE_COLUMNS[0]] = [TOMBSTONE_FLAG, "", ""]
+    df[TOMBSTONE_COLUMNS[1]] = ""
+    df[TOMBSTONE_COLUMNS[2]] = ""
+
+    assert merge_start_stop(df).empty